@@ -0,0 +1,212 @@
+"""
+API load benchmark over the WSGI interface
+
+Usage (from the repository root):
+    python -m benchmarks.load --users 1000 --posts 20000 --comments 100000 --output results.json
+    python -m benchmarks.load --users 100000 --posts 1000000 --comments 5000000 --database /tmp/big.db
+    python -m benchmarks.load --database /tmp/big.db --reuse --output after.json --compare before.json
+
+Seeds a synthetic dataset with bulk inserts (or reuses a seeded --database),
+then drives the Flask app through its test client - no server or network involved -
+and reports throughput and p50/p95/p99 latency of every scenario.
+Results are written as JSON, tagged with the current commit, to compare runs
+"""
+
+
+# Imports
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from .query_plans import seed
+
+
+PASSWORD = "Bench-passw0rd"
+
+
+# Functions
+def prepare(db, models, args):
+    """ Seed the dataset, all users share one password hash """
+
+    from core.passwords import hash_password
+
+    random.seed(args.seed)
+    db.create_all()
+    seed(db, models, args.users, args.posts, args.comments)
+    db.session.query(models.User).update({models.User.password: hash_password(PASSWORD)})
+    models.Post.reconcile_comment_counts()
+    db.session.execute("ANALYZE")
+    db.session.commit()
+
+def dataset(db, models):
+    """ Count seeded rows """
+
+    return {
+        "users": db.session.query(models.User).count(),
+        "posts": db.session.query(models.Post).count(),
+        "comments": db.session.query(models.Comment).count(),
+    }
+
+def scenarios(sizes, bearer):
+    """ Get (name, request kwargs factory) of every scenario """
+
+    auth = {"Authorization": "Bearer " + bearer}
+    user = lambda: f"u{random.randint(1, sizes['users']):015d}"
+    post = lambda: f"p{random.randint(1, sizes['posts']):015d}"
+
+    return [
+        ("GET /posts", lambda: dict(method="GET", path="/posts?limit=20", headers=auth)),
+        ("GET /posts?cursor", lambda: dict(method="GET", path="/posts?limit=20&cursor=", headers=auth)),
+        ("GET /posts/<id>/comments", lambda: dict(method="GET", path=f"/posts/{post()}/comments?limit=20", headers=auth)),
+        ("GET /users/<id>/posts", lambda: dict(method="GET", path=f"/users/{user()}/posts?limit=20", headers=auth)),
+        ("POST /auth/token", lambda: dict(method="POST", path="/auth/token", json={
+            "email": f"user{random.randint(1, sizes['users'])}@bench.io",
+            "password": PASSWORD
+        })),
+    ]
+
+def drive(app, make_request, requests, threads):
+    """ Send requests from a number of threads, returns latencies (ms) and errors """
+
+    def worker(count):
+        client = app.test_client()
+        latencies, errors = list(), 0
+        for _ in range(count):
+            kwargs = make_request()
+            started = time.perf_counter()
+            response = client.open(**kwargs)
+            response.get_data()
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+        return latencies, errors
+
+    shares = [requests // threads + (i < requests % threads) for i in range(threads)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(worker, shares))
+    elapsed = time.perf_counter() - started
+
+    latencies = [l for r in results for l in r[0]]
+    errors = sum(r[1] for r in results)
+    return latencies, errors, elapsed
+
+def summarize(latencies, errors, elapsed):
+    """ Get throughput and latency percentiles of a scenario """
+
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "mean_ms": round(statistics.mean(latencies), 3),
+        "p50_ms": round(cuts[49], 3),
+        "p95_ms": round(cuts[94], 3),
+        "p99_ms": round(cuts[98], 3),
+        "max_ms": round(max(latencies), 3),
+    }
+
+def compare(results, path):
+    """ Print p50/p99 changes against a previous results file """
+
+    with open(path) as f:
+        previous = json.load(f)
+
+    print(f"\ncompared to {path} ({previous.get('commit')})")
+    for name, r in results.items():
+        before = previous["scenarios"].get(name)
+        if not before:
+            continue
+        changes = [
+            f"{key[:-3]} {(r[key] - before[key]) / before[key] * 100:+7.1f}%"
+            for key in ("p50_ms", "p99_ms")
+            if before[key]
+        ]
+        print(f"{name:<26} {'  '.join(changes)}")
+
+def commit():
+    """ Get the current commit, None outside of a git checkout """
+
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--posts", type=int, default=20000)
+    parser.add_argument("--comments", type=int, default=100000)
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--warmup", type=int, default=50, help="unmeasured requests per scenario")
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database", help="SQLite file, a throwaway one by default")
+    parser.add_argument("--reuse", action="store_true", help="skip seeding, --database is already seeded")
+    parser.add_argument("--output", help="JSON results file")
+    parser.add_argument("--compare", help="JSON results file of a previous run")
+    args = parser.parse_args()
+
+    # Quotas would throttle the benchmark client
+    os.environ["RATELIMIT_ENABLED"] = "false"
+
+    path = args.database or os.path.join(tempfile.mkdtemp(), "bench.db")
+
+    from core import app, db
+    from core import models
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.abspath(path)}"
+    app.config["SQLALCHEMY_BINDS"] = dict(
+        app.config["SQLALCHEMY_BINDS"],
+        jobs=f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'jobs.db')}"
+    )
+
+    with app.app_context():
+        if not args.reuse:
+            print(f"seeding {args.users} users, {args.posts} posts, {args.comments} comments into {path}")
+            started = time.perf_counter()
+            prepare(db, models, args)
+            print(f"seeded in {time.perf_counter() - started:.1f} s")
+        sizes = dataset(db, models)
+
+    random.seed(args.seed)
+    client = app.test_client()
+    token = client.post("/auth/token", json={"email": "user1@bench.io", "password": PASSWORD})
+    assert token.status_code == 201, token.get_json()
+    bearer = token.get_json()["bearer"]["token"]
+
+    results = dict()
+    for name, make_request in scenarios(sizes, bearer):
+        drive(app, make_request, args.warmup, 1)
+        results[name] = summarize(*drive(app, make_request, args.requests, args.threads))
+        r = results[name]
+        print(f"{name:<26} {r['throughput_rps']:9.1f} req/s  p50 {r['p50_ms']:8.2f}  "
+              f"p95 {r['p95_ms']:8.2f}  p99 {r['p99_ms']:8.2f} ms  errors {r['errors']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "commit": commit(),
+                "time": datetime.now().isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "json_backend": app.json_encoder.__name__,
+                "dataset": sizes,
+                "requests": args.requests,
+                "threads": args.threads,
+                "scenarios": results,
+            }, f, indent=2)
+        print(f"results written to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
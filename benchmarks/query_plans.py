@@ -0,0 +1,162 @@
+"""
+Query plans and timings of the listing queries, before and after the listing indexes
+
+Usage (from the repository root):
+    python -m benchmarks.query_plans --users 1000 --posts 50000 --comments 200000
+
+Seeds a throwaway SQLite database, then runs every listing query
+without the listing indexes and with them, printing the SQLite query plan
+and the median time of each
+"""
+
+
+# Imports
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import event
+
+
+# Listing indexes created by the c7d05e4f9a21 migration
+INDEXES = {
+    "ix_post_created_id": "post (created, id)",
+    "ix_post_owner_id_created_id": "post (owner_id, created, id)",
+    "ix_comment_post_id_created_id": "comment (post_id, created, id)",
+    "ix_comment_owner_id_created_id": "comment (owner_id, created, id)",
+}
+
+
+# Functions
+def seed(db, models, users, posts, comments, chunk=10000):
+    """ Bulk insert a synthetic dataset with Core executemany """
+
+    start = datetime(2020, 1, 1)
+    rows = [
+        dict(id=i, uid=f"u{i:015d}", email=f"user{i}@bench.io", password="-",
+             display_name=f"user{i}", color="#000000", created=start, updated=start)
+        for i in range(1, users + 1)
+    ]
+    db.session.execute(models.User.__table__.insert(), rows)
+
+    for first in range(1, posts + 1, chunk):
+        rows = list()
+        for i in range(first, min(first + chunk, posts + 1)):
+            created = start + timedelta(seconds=i * 30)
+            rows.append(dict(id=i, uid=f"p{i:015d}", owner_id=random.randint(1, users),
+                             content="lorem ipsum " * 10, comment_count=0,
+                             created=created, updated=created))
+        db.session.execute(models.Post.__table__.insert(), rows)
+
+    for first in range(1, comments + 1, chunk):
+        rows = list()
+        for i in range(first, min(first + chunk, comments + 1)):
+            created = start + timedelta(seconds=i * 10)
+            rows.append(dict(id=i, uid=f"c{i:015d}", owner_id=random.randint(1, users),
+                             post_id=random.randint(1, posts), content="lorem ipsum",
+                             created=created, updated=created))
+        db.session.execute(models.Comment.__table__.insert(), rows)
+
+    db.session.commit()
+
+@contextmanager
+def explained(engine, plans):
+    """ Collect the SQLite query plan of every statement run within the block """
+
+    def explain(conn, cursor, statement, parameters, context, executemany):
+        raw = conn.connection.cursor()
+        raw.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+        plans.extend(row[-1] for row in raw.fetchall())
+        raw.close()
+
+    event.listen(engine, "before_cursor_execute", explain)
+    try:
+        yield
+    finally:
+        event.remove(engine, "before_cursor_execute", explain)
+
+def measure(db, name, make_query, repeat):
+    """ Get the query plan and the median run time (ms) of a query """
+
+    plans = list()
+    with explained(db.engine, plans):
+        make_query().all()
+
+    timings = list()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        make_query().all()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    return name, plans, statistics.median(timings)
+
+def run(db, models, repeat):
+    """ Measure every listing access pattern """
+
+    from core.pagination import decode_cursor, encode_cursor
+
+    User, Post = models.User, models.Post
+    user = db.session.get(User, 1)
+    post = db.session.query(Post).order_by(Post.comment_count.desc()).first()
+    deep = Post.get_all(10000, 1).first()
+    cursor = decode_cursor(encode_cursor(deep)) if deep else tuple()
+
+    return [
+        measure(db, "feed, first page", lambda: Post.get_all(0, 20), repeat),
+        measure(db, "feed, offset 10000", lambda: Post.get_all(10000, 20), repeat),
+        measure(db, "feed, cursor at 10000", lambda: Post.get_all(0, 20, cursor), repeat),
+        measure(db, "user posts", lambda: user.get_posts(0, 20), repeat),
+        measure(db, "user comments, cursor", lambda: user.get_comments(0, 20, tuple()), repeat),
+        measure(db, "post comments", lambda: post.get_comments(0, 20), repeat),
+    ]
+
+def report(title, results):
+    """ Print measured plans and timings """
+
+    print(f"\n== {title} ==")
+    for name, plans, median in results:
+        print(f"{name:<24} {median:9.3f} ms")
+        for plan in plans:
+            print(f"{'':<26}{plan}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--posts", type=int, default=50000)
+    parser.add_argument("--comments", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+
+    from core import app, db
+    from core import models
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{path}"
+    app.config["SQLALCHEMY_BINDS"] = dict(
+        app.config["SQLALCHEMY_BINDS"],
+        jobs=f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'jobs.db')}"
+    )
+
+    with app.app_context():
+        db.create_all()
+        for index in INDEXES:
+            db.session.execute(f"DROP INDEX {index}")
+
+        print(f"seeding {args.users} users, {args.posts} posts, {args.comments} comments into {path}")
+        seed(db, models, args.users, args.posts, args.comments)
+        db.session.execute("ANALYZE")
+        report("without listing indexes", run(db, models, args.repeat))
+
+        for index, columns in INDEXES.items():
+            db.session.execute(f"CREATE INDEX {index} ON {columns}")
+        db.session.execute("ANALYZE")
+        db.session.commit()
+        report("with listing indexes", run(db, models, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+JSON encoding micro-benchmark over a 20-post feed page
+
+Usage (from the repository root):
+    python -m benchmarks.serialization --number 2000
+
+Encodes the same feed page through flask.json.dumps with Flask's default
+encoder and every available JSON backend, compact and indented
+(debug / JSONIFY_PRETTYPRINT_REGULAR), and prints the mean time per page
+"""
+
+
+# Imports
+import argparse
+import timeit
+from datetime import datetime, timedelta
+from flask import json
+from flask.json import JSONEncoder
+
+
+# Functions
+def feed_page(size=20):
+    """ Build a feed page shaped like Post.public_info output """
+
+    now = datetime.now()
+    return [
+        {
+            "id": f"p{i:015d}",
+            "content": "lorem ipsum dolor sit amet " * 20,
+            "created": f"{i} minutes ago",
+            "updated": now - timedelta(minutes=i),
+            "comments": i * 3,
+            "owner": {
+                "id": f"u{i:015d}",
+                "display_name": f"user{i}",
+                "color": "#A1B2C3"
+            },
+            "actions": ["View"]
+        }
+        for i in range(size)
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    from core import app
+    from core.serialization import get_encoder, orjson
+
+    encoders = [("flask default", JSONEncoder), ("stdlib", get_encoder("stdlib"))]
+    if orjson is not None:
+        encoders.append(("orjson", get_encoder("orjson")))
+    page = feed_page()
+
+    with app.app_context():
+        for backend, encoder in encoders:
+            for indent in (None, 2):
+                seconds = timeit.timeit(
+                    lambda: json.dumps(page, cls=encoder, indent=indent),
+                    number=args.number
+                )
+                label = f"{backend}, {'indented' if indent else 'compact'}"
+                print(f"{label:<24} {seconds / args.number * 1e6:9.1f} us/page")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,28 +8,42 @@ Flask backend for a little tiny social network app
 
 # Imports
 from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from .config import Config
+from .database import RoutingSQLAlchemy
+from .serialization import get_encoder
 from flask_cors import CORS
 
 
 # Flask app
 app = Flask(__name__)
 app.config.from_object(Config)
-db = SQLAlchemy(app)
+app.json_encoder = get_encoder(app.config["JSON_BACKEND"])
+db = RoutingSQLAlchemy(app)
 mig = Migrate(app, db)
 CORS(app) # TODO: Update CORS before production
 
 
 # Additional imports
+from .database import remember_writer
 from .exceptions import handler
-from .endpoints import auth, users, posts, comments
+from .timestamps import vary_time_format
+from .limiter import init_limiter
+from .metrics import init_metrics
+from .querywatch import init_querywatch
+from .endpoints import auth, users, posts, comments, search
+from . import commands
 
 
-# Registering error handler, blueprints
+# Registering error handler, response hooks, blueprints, rate limits, instrumentation
 app.register_error_handler(Exception, handler)
+app.after_request(vary_time_format)
+app.after_request(remember_writer)
 app.register_blueprint(auth)
 app.register_blueprint(users)
 app.register_blueprint(posts)
 app.register_blueprint(comments)
+app.register_blueprint(search)
+init_limiter(app)
+init_metrics(app)
+init_querywatch(app)
@@ -0,0 +1,205 @@
+"""
+Bulk import of users, posts and comments
+Records are read from JSONL or CSV streams and inserted page by page with Core executemany,
+only one page is held in memory at a time
+
+Record fields (uid and created are optional, generated when missing):
+    users - uid, email, password (plain text, hashed) or password_hash (stored as is),
+            display_name, color, created
+    posts - uid, owner (user uid), content, created
+    comments - uid, owner (user uid), post (post uid), content, created
+"""
+
+
+# Imports
+import csv
+import json
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+from sqlalchemy import bindparam
+from . import db, search_index
+from .models import Comment, Post, Timeline, User, feed_cache, hex_gen, uuid_batch
+from .passwords import hash_passwords
+
+
+# Readers
+def read_jsonl(stream):
+    """ Yield records of a JSON lines stream """
+
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+def read_csv(stream):
+    """ Yield records of a CSV stream with a header row """
+
+    for row in csv.DictReader(stream):
+        yield {k: v for k, v in row.items() if v != ""}
+
+def pages(records, size):
+    """ Split records into lists of at most size records """
+
+    records = iter(records)
+    while True:
+        page = list(islice(records, size))
+        if not page:
+            return
+        yield page
+
+
+# Functions
+def parse_time(value, default):
+    """ Parse an ISO timestamp, default in case it is missing """
+
+    return datetime.fromisoformat(value) if value else default
+
+def id_map(model, uids):
+    """ Map uids to row ids with a single IN query """
+
+    if not uids:
+        return dict()
+    rows = db.session.query(model.uid, model.id).filter(model.uid.in_(uids))
+    return dict(rows.all())
+
+def taken_uids(model, uids):
+    """ Get the uids already in the table with a single IN query """
+
+    if not uids:
+        return set()
+    return {u for u, in db.session.query(model.uid).filter(model.uid.in_(uids))}
+
+def with_uids(page):
+    """ Get the uid of every record, generating missing ones in one batch """
+
+    generated = iter(uuid_batch(sum(1 for r in page if not r.get("uid")), 16))
+    return [r.get("uid") or next(generated) for r in page]
+
+def import_users(page):
+    """ Insert a page of users, skipping taken emails and uids, returns (inserted, skipped) """
+
+    taken = {
+        e for e, in db.session.query(User.email)
+        .filter(User.email.in_({r["email"].lower() for r in page}))
+    }
+    uids = with_uids(page)
+    taken_uid = taken_uids(User, uids)
+    records = list()
+    for r, uid in zip(page, uids):
+        email = r["email"].lower()
+        if email not in taken and uid not in taken_uid:
+            taken.add(email)
+            taken_uid.add(uid)
+            records.append(dict(r, uid=uid))
+
+    plain = [r["password"] for r in records if not r.get("password_hash")]
+    hashed = iter(hash_passwords(plain))
+
+    now = datetime.now()
+    rows = list()
+    for r in records:
+        created = parse_time(r.get("created"), now)
+        rows.append(dict(
+            uid=r["uid"],
+            email=r["email"].lower(),
+            password=r.get("password_hash") or next(hashed),
+            display_name=r["display_name"],
+            color=r.get("color") or hex_gen(),
+            created=created,
+            updated=created
+        ))
+
+    if rows:
+        db.session.execute(User.__table__.insert(), rows)
+    return len(rows), len(page) - len(rows)
+
+def import_posts(page):
+    """ Insert a page of posts, skipping unknown owners and taken uids, returns (inserted, skipped) """
+
+    owners = id_map(User, {r["owner"] for r in page})
+    uids = with_uids(page)
+    taken = taken_uids(Post, uids)
+
+    now = datetime.now()
+    rows = list()
+    for r, uid in zip(page, uids):
+        if r["owner"] not in owners or uid in taken:
+            continue
+        taken.add(uid)
+        created = parse_time(r.get("created"), now)
+        rows.append(dict(
+            uid=uid,
+            owner_id=owners[r["owner"]],
+            content=r["content"],
+            comment_count=0,
+            created=created,
+            updated=created
+        ))
+
+    if rows:
+        db.session.execute(Post.__table__.insert(), rows)
+        search_index.index_where("posts", Post.uid.in_([row["uid"] for row in rows]))
+        Timeline.fan_out(Post.uid.in_([row["uid"] for row in rows]))
+    return len(rows), len(page) - len(rows)
+
+def import_comments(page):
+    """
+    Insert a page of comments, skipping unknown owners and posts and taken uids,
+    and add them to the post counters, returns (inserted, skipped)
+    """
+
+    owners = id_map(User, {r["owner"] for r in page})
+    posts = id_map(Post, {r["post"] for r in page})
+    uids = with_uids(page)
+    taken = taken_uids(Comment, uids)
+
+    now = datetime.now()
+    rows = list()
+    for r, uid in zip(page, uids):
+        if r["owner"] not in owners or r["post"] not in posts or uid in taken:
+            continue
+        taken.add(uid)
+        created = parse_time(r.get("created"), now)
+        rows.append(dict(
+            uid=uid,
+            owner_id=owners[r["owner"]],
+            post_id=posts[r["post"]],
+            content=r["content"],
+            created=created,
+            updated=created
+        ))
+
+    if rows:
+        db.session.execute(Comment.__table__.insert(), rows)
+        search_index.index_where("comments", Comment.uid.in_([row["uid"] for row in rows]))
+
+        # Increment every post counter once per page
+        counts = Counter(row["post_id"] for row in rows)
+        db.session.execute(
+            Post.__table__.update()
+            .where(Post.__table__.c.id == bindparam("post_id"))
+            .values(comment_count=Post.__table__.c.comment_count + bindparam("added")),
+            [{"post_id": k, "added": v} for k, v in counts.items()]
+        )
+    return len(rows), len(page) - len(rows)
+
+IMPORTERS = {
+    "users": import_users,
+    "posts": import_posts,
+    "comments": import_comments
+}
+
+def import_records(kind, records, page_size):
+    """
+    Import records of a kind page by page, committing every page
+    Yields (inserted, skipped) of every page
+    """
+
+    importer = IMPORTERS[kind]
+    for page in pages(records, page_size):
+        inserted, skipped = importer(page)
+        db.session.commit()
+        yield inserted, skipped
+
+    feed_cache.clear()
@@ -0,0 +1,114 @@
+"""
+Cache backends
+    Cache
+    TTLCache
+"""
+
+
+# Imports
+from collections import OrderedDict
+from threading import Lock
+import time
+
+
+# Caches
+class Cache(object):
+    """
+    Cache backend interface
+    Shared stores (e.g. redis, memcached) can implement the same methods
+    to share entries and invalidations between worker processes
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+    def get(self, key):
+        """ Get an entry, None in case it is missing or expired """
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        """ Store an entry for at most ttl seconds """
+        raise NotImplementedError
+
+    def delete(self, key):
+        """ Drop an entry if present """
+        raise NotImplementedError
+
+    def clear(self):
+        """ Drop all entries """
+        raise NotImplementedError
+
+
+class TTLCache(Cache):
+    """
+    Thread-safe LRU cache whose entries expire after ttl seconds
+    A maxsize or a ttl of 0 disables the cache
+    Hits and misses are counted for monitoring
+    """
+
+    def __init__(self, maxsize, ttl):
+        super().__init__(maxsize, ttl)
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        """ Get a live entry, None in case it is missing or expired """
+
+        with self._lock:
+            try:
+                expires, value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+
+            if expires <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """
+        Store an entry, evicting the least recently used one if full
+        A per-entry ttl may shorten the cache ttl, never extend it
+        """
+
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if self.maxsize <= 0 or ttl <= 0:
+            return
+
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        """ Drop an entry if present """
+
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """ Drop all entries """
+
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """ Get cache size and hit/miss counters """
+
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    def __len__(self):
+        return len(self._data)
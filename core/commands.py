@@ -0,0 +1,108 @@
+"""
+CLI commands
+    1. flask reconcile-comments
+    2. flask tune-password-hash
+    3. flask import-data
+    4. flask rebuild-search
+    5. flask jobs-worker
+    6. flask jobs-status
+"""
+
+
+# Imports
+import hashlib
+import time
+import click
+from . import app, db, jobs, search_index
+from .bulk import import_records, read_csv, read_jsonl
+from .models import Post
+
+
+# Commands
+@app.cli.command("reconcile-comments")
+def reconcile_comments():
+    """ Repair post comment counters that drifted from the comment table """
+
+    repaired = Post.reconcile_comment_counts()
+    db.session.commit()
+
+    click.echo(f"repaired {repaired} post(s)")
+
+
+@app.cli.command("tune-password-hash")
+@click.option("--target-ms", default=250, show_default=True, help="Time budget of one hash")
+def tune_password_hash(target_ms):
+    """ Suggest a PASSWORD_HASH_METHOD fitting a time budget on this machine """
+
+    # Measure PBKDF2 throughput and scale iterations to the budget
+    sample = 20000
+    started = time.perf_counter()
+    hashlib.pbkdf2_hmac("sha256", b"password", b"salt" * 4, sample)
+    elapsed = time.perf_counter() - started
+    iterations = int(sample * target_ms / 1000 / elapsed) // 1000 * 1000
+
+    click.echo(f"PASSWORD_HASH_METHOD=pbkdf2:sha256:{iterations}")
+
+
+@app.cli.command("import-data")
+@click.argument("kind", type=click.Choice(["users", "posts", "comments"]))
+@click.argument("source", type=click.File("r"))
+@click.option("--format", "fmt", type=click.Choice(["jsonl", "csv"]), help="Defaults to the file extension")
+@click.option("--page-size", default=1000, show_default=True, help="Records inserted per statement")
+def import_data(kind, source, fmt, page_size):
+    """
+    Bulk import users, posts or comments from a JSONL or CSV file ("-" for stdin)
+    Import users first, then posts, then comments, as records refer to each other by uid
+    """
+
+    fmt = fmt or ("csv" if source.name.endswith(".csv") else "jsonl")
+    records = read_csv(source) if fmt == "csv" else read_jsonl(source)
+
+    inserted, skipped = 0, 0
+    started = time.perf_counter()
+    for page_inserted, page_skipped in import_records(kind, records, page_size):
+        inserted += page_inserted
+        skipped += page_skipped
+        click.echo(f"\r{inserted} {kind} imported", nl=False)
+
+    elapsed = time.perf_counter() - started
+    click.echo(f"\r{inserted} {kind} imported, {skipped} skipped in {elapsed:.1f} s")
+
+
+@app.cli.command("rebuild-search")
+@click.option("--chunk-size", default=10000, show_default=True, help="Rows indexed per transaction")
+def rebuild_search(chunk_size):
+    """ Create the search index if needed and index every post and comment again (SQLite only) """
+
+    if db.engine.dialect.name != "sqlite":
+        click.echo("the search index requires SQLite, other databases search with LIKE")
+        return
+
+    for kind, indexed in search_index.rebuild(chunk_size):
+        click.echo(f"{indexed} {kind} indexed")
+
+    click.echo("search index rebuilt, restart the app in case it ran without one")
+
+
+@app.cli.command("jobs-worker")
+@click.option("--threads", type=int, help="Jobs run at once, defaults to JOB_WORKERS")
+@click.option("--poll", default=1.0, show_default=True, help="Seconds between checks of an empty queue")
+@click.option("--once", is_flag=True, help="Exit once the queue is drained")
+def jobs_worker(threads, poll, once):
+    """ Run background jobs until interrupted """
+
+    threads = threads or app.config["JOB_WORKERS"]
+    click.echo(f"running jobs on {threads} thread(s)")
+    try:
+        jobs.work(threads, poll, once)
+    except KeyboardInterrupt:
+        click.echo("stopped, running jobs finished")
+
+
+@app.cli.command("jobs-status")
+def jobs_status():
+    """ Count background jobs by status """
+
+    counts = jobs.stats()
+    for status in ("queued", "running", "done", "failed"):
+        click.echo(f"{status:<8} {counts.get(status, 0)}")
@@ -0,0 +1,50 @@
+"""
+Conditional GET helpers
+    make_etag
+    time_validator
+    conditional
+"""
+
+
+# Imports
+import hashlib
+from datetime import datetime
+from flask import Response, make_response, request
+from .timestamps import time_format
+
+
+# Functions
+def make_etag(*parts):
+    """
+    Generate an entity tag from validators (ids, updated timestamps, counters)
+    Lists and tuples of validators are supported
+    """
+
+    raw = "|".join(repr(p) for p in parts)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+def time_validator():
+    """
+    Get a validator for the negotiated timestamps format
+    Humanized ("x minutes ago") timestamps change every minute even when the data does not
+    """
+
+    fmt = time_format()
+    if fmt == "human":
+        return fmt + datetime.now().strftime("%Y%m%d%H%M")
+    return fmt
+
+def conditional(etag, build):
+    """
+    Answer 304 Not Modified in case the client already holds the current version,
+    otherwise build the response body and tag it with the etag
+    """
+
+    # Weak comparison (RFC 7232), proxies compressing responses weaken the etag
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = make_response(build())
+
+    response.set_etag(etag)
+    return response
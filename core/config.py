@@ -1,5 +1,143 @@
+import os
+
+
+def env(name, default):
+    """ Get an environment variable, cast to the type of its default (an empty number is None) """
+
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    if isinstance(default, bool):
+        return value.lower() in ("1", "true", "yes", "on")
+    if isinstance(default, int):
+        return int(value) if value.strip() else None
+    return value
+
+
 class Config(object):
-    SQLALCHEMY_DATABASE_URI = "sqlite:///database.db"
+    SQLALCHEMY_DATABASE_URI = env("DATABASE_URL", "sqlite:///database.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SECRET_KEY = "YOURSECRETKEY"
-    DEBUG = True
\ No newline at end of file
+    DEBUG = True
+
+    # Connection pool of server databases (not applied to SQLite)
+    DB_POOL_SIZE = env("DB_POOL_SIZE", 5)
+    DB_MAX_OVERFLOW = env("DB_MAX_OVERFLOW", 10)
+    DB_POOL_RECYCLE = env("DB_POOL_RECYCLE", 1800)
+    DB_POOL_PRE_PING = env("DB_POOL_PRE_PING", True)
+
+    if SQLALCHEMY_DATABASE_URI.startswith("sqlite"):
+        SQLALCHEMY_ENGINE_OPTIONS = dict()
+    else:
+        SQLALCHEMY_ENGINE_OPTIONS = {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": DB_POOL_PRE_PING
+        }
+
+    # Read replica used by read-only routes, users who wrote within
+    # the sticky window keep reading from the primary (entries, seconds)
+    REPLICA_DATABASE_URL = env("REPLICA_DATABASE_URL", "")
+    REPLICA_STICKY_SIZE = 10000
+    REPLICA_STICKY_SECONDS = env("REPLICA_STICKY_SECONDS", 5)
+
+    # Background jobs queue, a local SQLite database by default
+    JOBS_DATABASE_URL = env("JOBS_DATABASE_URL", "sqlite:///jobs.db")
+
+    SQLALCHEMY_BINDS = {"jobs": JOBS_DATABASE_URL}
+    if REPLICA_DATABASE_URL:
+        SQLALCHEMY_BINDS["replica"] = REPLICA_DATABASE_URL
+
+    # Pragmas applied to every new SQLite connection (empty values are skipped)
+    SQLITE_PRAGMAS = {
+        "journal_mode": env("SQLITE_JOURNAL_MODE", "WAL"),
+        "synchronous": env("SQLITE_SYNCHRONOUS", "NORMAL"),
+        "busy_timeout": env("SQLITE_BUSY_TIMEOUT", 5000),
+        "mmap_size": env("SQLITE_MMAP_SIZE", 268435456),
+        "cache_size": env("SQLITE_CACHE_SIZE", -20000)
+    }
+
+    # Password hashing method ("pbkdf2:<hash>:<iterations>" or "scrypt:<n>:<r>:<p>"),
+    # hashes made with another method are upgraded on login
+    PASSWORD_HASH_METHOD = env("PASSWORD_HASH_METHOD", "pbkdf2:sha256:260000")
+    PASSWORD_SALT_LENGTH = 16
+
+    # Password hashing pool (threads, seconds to wait before answering 503)
+    PASSWORD_HASH_WORKERS = env("PASSWORD_HASH_WORKERS", 4)
+    PASSWORD_HASH_TIMEOUT = 10
+
+    # Authenticated users cache (entries, seconds)
+    USER_CACHE_SIZE = 1024
+    USER_CACHE_TTL = 30
+
+    # Verified tokens cache (entries, max seconds, capped by token expiry)
+    TOKEN_CACHE_SIZE = 4096
+    TOKEN_CACHE_TTL = 3600
+
+    # Feed pages cache (backend class, entries, seconds)
+    FEED_CACHE_BACKEND = "core.cache.TTLCache"
+    FEED_CACHE_SIZE = 64
+    FEED_CACHE_TTL = 5
+
+    # Home timelines: posts of users with more followers than the limit are merged
+    # at read time instead of fanned out, posts copied to a timeline on follow
+    TIMELINE_FANOUT_LIMIT = env("TIMELINE_FANOUT_LIMIT", 10000)
+    TIMELINE_BACKFILL = 100
+
+    # Fan new posts out to follower timelines in a background job
+    TIMELINE_FANOUT_ASYNC = env("TIMELINE_FANOUT_ASYNC", False)
+
+    # Ids accepted by batch endpoints
+    BATCH_MAX_IDS = 100
+
+    # Rows fetched per query round trip by user exports
+    EXPORT_CHUNK_SIZE = 500
+
+    # JSON encoder backend (auto, orjson, stdlib)
+    JSON_BACKEND = "auto"
+
+    # Rate limiting storage ("memory://" per process, or a shared store e.g. "redis://host:6379")
+    RATELIMIT_ENABLED = env("RATELIMIT_ENABLED", True)
+    RATELIMIT_STORAGE_URI = env("RATELIMIT_STORAGE_URI", "memory://")
+    RATELIMIT_HEADERS_ENABLED = True
+
+    # Per-user quotas of each blueprint (keyed by token uid, client IP when anonymous)
+    RATELIMIT_BLUEPRINTS = {
+        "auth": env("RATELIMIT_AUTH_BLUEPRINT", "60/minute"),
+        "users": env("RATELIMIT_USERS", "300/minute"),
+        "posts": env("RATELIMIT_POSTS", "300/minute"),
+        "comments": env("RATELIMIT_COMMENTS", "300/minute"),
+        "search": env("RATELIMIT_SEARCH", "60/minute")
+    }
+
+    # Per-IP quota of signup and token requests
+    RATELIMIT_AUTH = env("RATELIMIT_AUTH", "10/minute")
+
+    # Request timing and SQL instrumentation (Server-Timing headers, GET /metrics)
+    METRICS_ENABLED = env("METRICS_ENABLED", False)
+
+    # Repeated (N+1) queries detector for development ("", "warn" or "raise"),
+    # reports statements run more than QUERYWATCH_THRESHOLD times by a request
+    QUERYWATCH_MODE = env("QUERYWATCH_MODE", "")
+    QUERYWATCH_THRESHOLD = env("QUERYWATCH_THRESHOLD", 5)
+
+    # Exceptions log (JSON lines file, rotation bytes and backups, queued records, records per write)
+    ERROR_LOG_FILE = env("ERROR_LOG_FILE", "exceptions.txt")
+    ERROR_LOG_MAX_BYTES = env("ERROR_LOG_MAX_BYTES", 10485760)
+    ERROR_LOG_BACKUPS = env("ERROR_LOG_BACKUPS", 5)
+    ERROR_LOG_QUEUE_SIZE = 10000
+    ERROR_LOG_BATCH_SIZE = 100
+
+    # Background jobs (worker threads, attempts, first retry delay in seconds doubling on
+    # every attempt, seconds before jobs of a crashed worker run again, seconds done jobs
+    # and their idempotency keys are kept)
+    JOB_WORKERS = env("JOB_WORKERS", 4)
+    JOB_MAX_ATTEMPTS = 5
+    JOB_RETRY_DELAY = 10
+    JOB_LEASE = 300
+    JOB_RETENTION = 86400
+
+    # Account deletion (run as a background job, rows deleted per chunk)
+    USER_DELETE_ASYNC = env("USER_DELETE_ASYNC", False)
+    USER_DELETE_CHUNK = 1000
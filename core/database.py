@@ -0,0 +1,113 @@
+"""
+Database engine configuration
+    1. Applies SQLITE_PRAGMAS to every new SQLite connection
+    2. Routes queries of read-only routes to the "replica" bind, when configured
+"""
+
+
+# Imports
+import sqlite3
+from flask import current_app, g, has_request_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import event, orm
+from sqlalchemy.engine import Engine
+from .cache import TTLCache
+
+
+# Listeners
+@event.listens_for(Engine, "connect")
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """ Configure new SQLite connections (WAL, synchronous, busy timeout, caches) """
+
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+
+    from . import app
+
+    cursor = dbapi_connection.cursor()
+    for pragma, value in app.config["SQLITE_PRAGMAS"].items():
+        if value is None or value == "":
+            continue
+        cursor.execute(f"PRAGMA {pragma}={value}")
+    cursor.close()
+
+
+# Read replica routing
+class RoutingSession(SignallingSession):
+    """
+    Session sending reads of read-only routes to the replica bind
+    Flushes, writes, models with their own bind and users who wrote
+    within the last REPLICA_STICKY_SECONDS stay on the primary
+    """
+
+    def __init__(self, db, **options):
+        self.db = db
+        super().__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None):
+        if mapper is not None and mapper.persist_selectable.info.get("bind_key"):
+            return super().get_bind(mapper, clause)
+
+        if self._flushing or self.new or self.dirty or self.deleted or not use_replica():
+            return super().get_bind(mapper, clause)
+
+        return self.db.get_engine(self.app, bind="replica")
+
+
+# Engine options of server database pools, rejected by SQLite engines
+SERVER_POOL_OPTIONS = ("pool_size", "max_overflow", "pool_recycle", "pool_pre_ping")
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """ Flask-SQLAlchemy extension using the routing session """
+
+    def init_app(self, app):
+        super().init_app(app)
+        self.recent_writers = TTLCache(
+            app.config["REPLICA_STICKY_SIZE"],
+            app.config["REPLICA_STICKY_SECONDS"]
+        )
+
+    def create_engine(self, sa_url, engine_opts):
+        # SQLALCHEMY_ENGINE_OPTIONS apply to every bind, SQLite binds (e.g. the jobs queue
+        # next to a server primary) take no queue pool options
+        if sa_url.drivername.startswith("sqlite"):
+            engine_opts = {k: v for k, v in engine_opts.items() if k not in SERVER_POOL_OPTIONS}
+        return super().create_engine(sa_url, engine_opts)
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+# Functions
+def use_replica():
+    """
+    Check whether the current request may read from the replica:
+    the route is read-only, a replica is configured and
+    the current user has not written recently (read-your-own-writes)
+    """
+
+    if not has_request_context() or not g.get("read_only"):
+        return False
+
+    if "replica" not in current_app.config.get("SQLALCHEMY_BINDS", dict()):
+        return False
+
+    uid = g.get("uid")
+    db = current_app.extensions["sqlalchemy"].db
+    return uid is None or db.recent_writers.get(uid) is None
+
+@event.listens_for(RoutingSession, "after_flush")
+def mark_write(session, flush_context):
+    """ Remember the current request wrote to the primary """
+
+    if has_request_context():
+        g.wrote = True
+
+def remember_writer(response):
+    """ Keep reads of users who just wrote on the primary for a while """
+
+    uid = g.get("uid")
+    if g.get("wrote") and uid is not None:
+        db = current_app.extensions["sqlalchemy"].db
+        db.recent_writers.set(uid, True)
+    return response
@@ -6,13 +6,40 @@ Endpoint decorators
 # Imports
 from werkzeug.exceptions import BadRequest, Unauthorized
 from functools import wraps
-from flask import request
+from flask import g, request
 from jwt.exceptions import PyJWTError
 from . import app
+from .cache import TTLCache
 from .models import User
+from .pagination import decode_cursor
+import hashlib
+import time
 import jwt
 
 
+# Caches
+token_cache = TTLCache(app.config["TOKEN_CACHE_SIZE"], app.config["TOKEN_CACHE_TTL"])
+
+
+# Functions
+def decode_token(token):
+    """
+    Verify and decode a JWT
+    Verified claims are cached by token digest until the token expires,
+    raises PyJWTError in case the token is invalid
+    """
+
+    key = hashlib.sha256(token.encode()).hexdigest()
+    decoded = token_cache.get(key)
+    if decoded is not None:
+        return decoded
+
+    decoded = jwt.decode(jwt=token, key=app.secret_key, algorithms=["HS256"])
+    if "exp" in decoded:
+        token_cache.set(key, decoded, ttl=decoded["exp"] - time.time())
+    return decoded
+
+
 # Decorators
 def decorator_boilerplate(f):
     @wraps(f)
@@ -21,6 +48,17 @@ def decorator_boilerplate(f):
         return f(data, *args, **kwargs)
     return decorated
 
+def read_only(f):
+    """
+    Marks a route as read-only,
+    its queries may be served by the read replica
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        g.read_only = True
+        return f(*args, **kwargs)
+    return decorated
+
 def json_required(f):
     """
     Verifies request contains a valid json
@@ -69,7 +107,7 @@ def bearer_required(f) -> User:
 
         # Decode token
         try:
-            decoded = jwt.decode(jwt=token, key=app.secret_key, algorithms=["HS256"])
+            decoded = decode_token(token)
         except PyJWTError:
             raise Unauthorized(description="could not authenticate")
         
@@ -79,8 +117,10 @@ def bearer_required(f) -> User:
         except AssertionError:
             raise Unauthorized(description="could not authenticate")
         
-        # Find the relevant user in DB
-        user = User.find_by_uid(decoded["uid"])
+        # Find the relevant user in DB, through the user cache on read-only routes only:
+        # a cached user may have been deleted by another process within the cache TTL
+        g.uid = decoded["uid"]
+        user = User.find_by_uid_cached(decoded["uid"]) if g.get("read_only") else User.find_by_uid(decoded["uid"])
         if not user:
             raise Unauthorized(description="could not authenticate")
         
@@ -106,7 +146,7 @@ def refresh_required(f) -> User:
 
         # Decode token
         try:
-            decoded = jwt.decode(jwt=token, key=app.secret_key, algorithms=["HS256"])
+            decoded = decode_token(token)
         except PyJWTError:
             raise Unauthorized(description="could not authenticate")
 
@@ -117,6 +157,7 @@ def refresh_required(f) -> User:
             raise Unauthorized(description="could not authenticate")
 
         # Find the relevant user in DB
+        g.uid = decoded["uid"]
         user = User.find_by_uid(decoded["uid"])
         if not user:
             raise Unauthorized(description="could not authenticate")
@@ -129,12 +170,15 @@ def pagination_required(f):
     """ 
     Verifies request params contain a valid offset and a limit
     In case those are missing, offset defaults to 0 and limit defaults to 100
+    A "cursor" param switches to keyset pagination (empty cursor for the first page),
+    the decoded cursor is None in offset mode
     """
     @wraps(f)
     def decorated(*args, **kwargs):
-        # Get offset and limit request parameters
+        # Get offset, limit and cursor request parameters
         offset = request.args.get('offset')
         limit = request.args.get('limit')
+        cursor = request.args.get('cursor')
 
         # If offset is False, default to 0
         if not offset:
@@ -158,6 +202,13 @@ def pagination_required(f):
         except ValueError:
             errors["limit"] = "limit must be an integer"
 
+        # Decode cursor if provided
+        if cursor is not None:
+            try:
+                cursor = decode_cursor(cursor)
+            except ValueError:
+                errors["cursor"] = "invalid cursor"
+
         # Return errors if found
         if errors:
             return {
@@ -173,6 +224,36 @@ def pagination_required(f):
         if limit <= 0 or limit > 20:
             limit = 20
         
-        # Return offset and limit
-        return f(offset, limit, *args, **kwargs)
-    return decorated
\ No newline at end of file
+        # Return offset, limit and cursor
+        return f(offset, limit, cursor, *args, **kwargs)
+    return decorated
+
+def ids_required(f):
+    """
+    Verifies request params contain a comma separated list of ids ("ids"),
+    of at most BATCH_MAX_IDS distinct ids
+    Duplicates are dropped, the order is kept
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        # Split ids, dropping blanks and duplicates
+        raw = request.args.get("ids", "")
+        ids = list(dict.fromkeys(i.strip() for i in raw.split(",") if i.strip()))
+
+        # Verify the number of ids
+        errors = dict()
+        limit = app.config["BATCH_MAX_IDS"]
+        if not ids:
+            errors["ids"] = "ids are required"
+        elif len(ids) > limit:
+            errors["ids"] = f"at most {limit} ids are allowed"
+
+        # Return errors if found
+        if errors:
+            return {
+                "message": "validation error",
+                "errors": errors
+            }, 400
+
+        return f(ids, *args, **kwargs)
+    return decorated
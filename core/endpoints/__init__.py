@@ -6,4 +6,5 @@ Endpoints
 from .auth import auth
 from .users import users
 from .posts import posts
-from .comments import comments
\ No newline at end of file
+from .comments import comments
+from .search import search
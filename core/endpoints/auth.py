@@ -7,14 +7,16 @@ Auth endpoints
 
 
 # Imports
-from flask import Blueprint, current_app
+from flask import Blueprint, current_app, g
 from pydantic import ValidationError
 from ..decorators import json_required, refresh_required
+from ..limiter import limiter
+from flask_limiter.util import get_remote_address
 from ..validation import schemas, helpers
 from ..models import User
-from .. import db
+from ..passwords import needs_rehash
+from .. import app, db
 from werkzeug.exceptions import BadRequest, Unauthorized
-from werkzeug.security import check_password_hash
 from datetime import datetime, timedelta
 import jwt
 
@@ -25,6 +27,7 @@ auth = Blueprint(name="auth", import_name=__name__, url_prefix="/auth")
 
 # Routes
 @auth.route("signup", methods=["POST"])
+@limiter.limit(app.config["RATELIMIT_AUTH"], key_func=get_remote_address)
 @json_required
 def signup(data):
     """ Create a new user """
@@ -52,11 +55,15 @@ def signup(data):
 
     db.session.commit()
 
+    # Keep reads of the new user on the primary until the replica has the account
+    g.uid = new_user.uid
+
     # Return new user data
     return new_user.private_info(), 201
 
 
 @auth.route("token", methods=["POST"])
+@limiter.limit(app.config["RATELIMIT_AUTH"], key_func=get_remote_address)
 @json_required
 def token(data):
     """ Create bearer + refresh tokens """
@@ -91,10 +98,15 @@ def token(data):
 
     # Verify password is correct
     try:
-        assert check_password_hash(user.password, data["password"])
+        assert user.check_password(data["password"])
     except AssertionError:
         raise Unauthorized(description="could not authenticate")
 
+    # Upgrade the hash in case the hashing parameters have changed
+    if needs_rehash(user.password):
+        user.set_password(data["password"])
+        db.session.commit()
+
     # Generate new access and refresh tokens
     bearer_exp = timedelta(hours=1)
     refresh_exp = timedelta(days=1)
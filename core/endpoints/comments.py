@@ -4,6 +4,7 @@ Comments endpoints
     2. GET /<comment_id>
     3. PATCH /<comment_id>
     4. DELETE /<comment_id>
+    5. GET /batch
 """
 
 
@@ -12,8 +13,10 @@ from flask import Blueprint, Response
 from pydantic import ValidationError
 from werkzeug.exceptions import NotFound, Forbidden
 from core.models import Comment
-from ..decorators import json_required, bearer_required
+from ..decorators import json_required, bearer_required, ids_required, read_only
 from ..validation import helpers, schemas
+from ..conditional import conditional, make_etag, time_validator
+from ..pagination import batch_page
 from .. import db
 
 
@@ -22,7 +25,23 @@ comments = Blueprint(name="comments", import_name=__name__, url_prefix="/comment
 
 
 # Routes
+@comments.route("batch", methods=["GET"])
+@read_only
+@bearer_required
+@ids_required
+def batch(ids, user):
+    """ View comments by UIDs (?ids=a,b,c) """
+
+    # Fetch all requested comments at once
+    found = Comment.find_by_uids(ids)
+    etag = make_etag(user.uid, ids, [c.validator() for c in found.values()], time_validator())
+
+    # Skip serialization in case the client holds the current version
+    return conditional(etag, lambda: batch_page(ids, found, lambda c: c.public_info(user)))
+
+
 @comments.route("<comment_id>", methods=["GET"])
+@read_only
 @bearer_required
 def view(user, comment_id):
     """ View comment """
@@ -32,7 +51,9 @@ def view(user, comment_id):
     if not comment:
         raise NotFound(description="comment not found")
 
-    return comment.public_info(user)
+    # Return comment info, unless the client holds the current version
+    etag = make_etag(user.uid, comment.validator(), time_validator())
+    return conditional(etag, lambda: comment.public_info(user))
 
 
 @comments.route("<comment_id>", methods=["PATCH"])
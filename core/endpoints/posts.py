@@ -5,16 +5,20 @@ Posts endpoints
     3. GET /<post_id>
     4. PATCH /<post_id>
     5. DELETE /<post_id>
+    6. GET /batch
+    7. GET /home
 """
 
 
 # Imports
 from flask import Blueprint, Response, jsonify, request
 from pydantic import ValidationError
-from ..decorators import bearer_required, json_required, pagination_required
+from ..decorators import bearer_required, ids_required, json_required, pagination_required, read_only
 from werkzeug.exceptions import NotFound, Forbidden
 from ..validation import schemas, helpers
 from ..models import Comment, Post
+from ..pagination import batch_page, cursor_page
+from ..conditional import conditional, make_etag, time_validator
 from .. import db
 
 # Blueprint
@@ -43,21 +47,73 @@ def create(user, data):
 
 
 @posts.route("", methods=["GET"])
+@read_only
 @bearer_required
 @pagination_required
-def get_all(offset, limit, user):
+def get_all(offset, limit, cursor, user):
     """ Fetch all posts """
-    
-    result = list()
 
-    posts = Post.get_all(offset, limit)
-    for p in posts:
-        result.append(p.public_info(user))
+    # Feed pages are shared between users, only actions are computed per user
+    page = Post.get_feed(offset, limit, cursor)
+    etag = make_etag(user.uid, page["validator"], time_validator())
+
+    def build():
+        result = Post.feed_info(page, user)
+
+        # Return a page object in cursor mode
+        if cursor is not None:
+            return {
+                "data": result,
+                "next_cursor": page["next_cursor"]
+            }
+
+        return jsonify(result)
+
+    # Skip serialization in case the client holds the current page
+    return conditional(etag, build)
+
+
+@posts.route("home", methods=["GET"])
+@read_only
+@bearer_required
+@pagination_required
+def home(offset, limit, cursor, user):
+    """ Fetch the home timeline: own posts and posts of followed users """
+
+    # Fetch a page of the timeline
+    posts = user.get_home(offset, limit, cursor)
+    etag = make_etag(user.uid, [p.validator() for p in posts], time_validator())
+
+    def build():
+        result = [p.public_info(user) for p in posts]
+
+        # Return a page object in cursor mode
+        if cursor is not None:
+            return cursor_page(result, posts, limit)
 
-    return jsonify(result)
+        return jsonify(result)
+
+    # Skip serialization in case the client holds the current page
+    return conditional(etag, build)
+
+
+@posts.route("batch", methods=["GET"])
+@read_only
+@bearer_required
+@ids_required
+def batch(ids, user):
+    """ Get posts by UIDs (?ids=a,b,c) """
+
+    # Fetch all requested posts at once
+    found = Post.find_by_uids(ids)
+    etag = make_etag(user.uid, ids, [p.validator() for p in found.values()], time_validator())
+
+    # Skip serialization in case the client holds the current version
+    return conditional(etag, lambda: batch_page(ids, found, lambda p: p.public_info(user)))
 
 
 @posts.route("<post_id>", methods=["GET"])
+@read_only
 @bearer_required
 def view(user, post_id):
     """ Get post by UID """
@@ -67,8 +123,9 @@ def view(user, post_id):
     if not post:
         raise NotFound(description="post not found")
 
-    # Return post info
-    return post.public_info(user)
+    # Return post info, unless the client holds the current version
+    etag = make_etag(user.uid, post.validator(), time_validator())
+    return conditional(etag, lambda: post.public_info(user))
 
 @posts.route("<post_id>", methods=["PATCH"])
 @bearer_required
@@ -150,9 +207,10 @@ def comment(data, user, post_id):
 
 
 @posts.route("<post_id>/comments", methods=["GET"])
+@read_only
 @bearer_required
 @pagination_required
-def comments(offset, limit, user, post_id):
+def comments(offset, limit, cursor, user, post_id):
     """ Get post comments """
 
     # Fetch post from DB
@@ -160,11 +218,22 @@ def comments(offset, limit, user, post_id):
     if not post:
         raise NotFound(description="post not found")
 
-    # Create an array of post comments
-    comments = post.get_comments(offset, limit)
-    result = list()
-    for c in comments:
-        result.append(c.public_info(user))
-    
-    # Return an array
-    return jsonify(result)
+    # Fetch a page of post comments
+    comments = post.get_comments(offset, limit, cursor).all()
+    etag = make_etag(user.uid, post.uid, [c.validator() for c in comments], time_validator())
+
+    def build():
+        # Create an array of post comments
+        result = list()
+        for c in comments:
+            result.append(c.public_info(user))
+
+        # Return a page object in cursor mode
+        if cursor is not None:
+            return cursor_page(result, comments, limit)
+
+        # Return an array
+        return jsonify(result)
+
+    # Skip serialization in case the client holds the current page
+    return conditional(etag, build)
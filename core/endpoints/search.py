@@ -0,0 +1,52 @@
+"""
+Search endpoints
+    1. GET /?q=<query>&type=<posts|comments>
+"""
+
+
+# Imports
+from flask import Blueprint, jsonify, request
+from ..decorators import bearer_required, pagination_required, read_only
+from ..models import Comment, Post
+from .. import search_index as index
+
+
+# Blueprint
+search = Blueprint(name="search", import_name=__name__, url_prefix="/search")
+
+
+# Routes
+@search.route("", methods=["GET"])
+@read_only
+@bearer_required
+@pagination_required
+def find(offset, limit, cursor, user):
+    """
+    Search posts (default) or comments, best matches first
+    Results are paginated by offset and limit only, a cursor is rejected
+    """
+
+    q = request.args.get("q", "")
+    kind = request.args.get("type", "posts")
+
+    # Validate query and type
+    errors = dict()
+    if not index.match_expression(q):
+        errors["q"] = "a search query is required"
+    if kind not in index.TABLES:
+        errors["type"] = "type must be one of: posts, comments"
+    if cursor is not None:
+        errors["cursor"] = "search is paginated by offset and limit only"
+
+    if errors:
+        return {
+            "message": "validation error",
+            "errors": errors
+        }, 400
+
+    # Fetch a page of results
+    model = Post if kind == "posts" else Comment
+    results = index.search(model, kind, q, offset, limit)
+
+    # Return an array
+    return jsonify([r.public_info(user) for r in results])
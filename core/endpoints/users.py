@@ -4,15 +4,21 @@ Users endpoints
     2. GET /me
     3. PATCH /me
     4. DELETE /me
+    5. GET /<uid>/export
+    6. GET /batch
+    7. POST /<uid>/follow
+    8. DELETE /<uid>/follow
 """
 
 
 # Imports
-from flask import Blueprint, Response, jsonify
+from flask import Blueprint, Response, current_app, json, jsonify, request, stream_with_context
 from pydantic import ValidationError
-from werkzeug.exceptions import NotFound
-from ..decorators import bearer_required, json_required, pagination_required
-from ..models import User
+from werkzeug.exceptions import BadRequest, NotFound
+from ..decorators import bearer_required, ids_required, json_required, pagination_required, read_only
+from ..models import EXPORT_KINDS, User
+from ..pagination import batch_page, cursor_page, decode_stream_cursor, encode_stream_cursor
+from ..conditional import conditional, make_etag, time_validator
 from ..validation import schemas, helpers
 from .. import db
 
@@ -22,7 +28,23 @@ users = Blueprint(name="users", import_name=__name__, url_prefix="/users")
 
 
 # Routes
+@users.route("batch", methods=["GET"])
+@read_only
+@bearer_required
+@ids_required
+def batch(ids, user):
+    """ Get users' public profiles by UIDs (?ids=a,b,c) """
+
+    # Fetch all requested users at once
+    found = User.find_by_uids(ids)
+    etag = make_etag(ids, [u.validator() for u in found.values()])
+
+    # Skip serialization in case the client holds the current version
+    return conditional(etag, lambda: batch_page(ids, found, lambda u: u.public_info()))
+
+
 @users.route("<user_id>", methods=["GET"])
+@read_only
 @bearer_required
 def public_profile(user, user_id):
     """ Get user's public profile """
@@ -32,14 +54,16 @@ def public_profile(user, user_id):
     if not u:
         raise NotFound(description="user not found")
     
-    # Return user info
-    return u.public_info()
+    # Return user info, unless the client holds the current version
+    etag = make_etag(u.validator())
+    return conditional(etag, u.public_info)
 
 
 @users.route("<user_id>/posts", methods=["GET"])
+@read_only
 @bearer_required
 @pagination_required
-def user_posts(offset, limit, user, user_id):
+def user_posts(offset, limit, cursor, user, user_id):
     """ Get posts by user UID """
 
    # Find user by uid
@@ -47,20 +71,32 @@ def user_posts(offset, limit, user, user_id):
     if not u:
         raise NotFound(description="user not found")
 
-    # Create an array of user posts
-    posts = u.get_posts(offset, limit)
-    result = list()
-    for p in posts:
-        result.append(p.public_info())
-    
-    # Return an array
-    return jsonify(result)
+    # Fetch a page of user posts
+    posts = u.get_posts(offset, limit, cursor).all()
+    etag = make_etag(user.uid, [p.validator() for p in posts], time_validator())
+
+    def build():
+        # Create an array of user posts
+        result = list()
+        for p in posts:
+            result.append(p.public_info(user))
+
+        # Return a page object in cursor mode
+        if cursor is not None:
+            return cursor_page(result, posts, limit)
+
+        # Return an array
+        return jsonify(result)
+
+    # Skip serialization in case the client holds the current page
+    return conditional(etag, build)
 
 
 @users.route("<user_id>/comments", methods=["GET"])
+@read_only
 @bearer_required
 @pagination_required
-def user_comments(offset, limit, user, user_id):
+def user_comments(offset, limit, cursor, user, user_id):
     """ Get comments by user UID """
 
    # Find user by uid
@@ -68,16 +104,118 @@ def user_comments(offset, limit, user, user_id):
     if not u:
         raise NotFound(description="user not found")
 
-    # Create an array of user comments
-    comments = u.get_comments(offset, limit)
-    result = list()
-    for c in comments:
-        result.append(c.public_info())
-    
-    # Return an array
-    return jsonify(result)
+    # Fetch a page of user comments
+    comments = u.get_comments(offset, limit, cursor).all()
+    etag = make_etag(user.uid, [c.validator() for c in comments], time_validator())
+
+    def build():
+        # Create an array of user comments
+        result = list()
+        for c in comments:
+            result.append(c.public_info(user))
+
+        # Return a page object in cursor mode
+        if cursor is not None:
+            return cursor_page(result, comments, limit)
+
+        # Return an array
+        return jsonify(result)
+
+    # Skip serialization in case the client holds the current page
+    return conditional(etag, build)
+
+@users.route("<user_id>/export", methods=["GET"])
+@read_only
+@bearer_required
+def export(user, user_id):
+    """
+    Stream all posts, then all comments by user UID as NDJSON, newest first
+    Every line carries the cursor resuming the stream right after it,
+    a final {"type": "end"} line marks a complete export
+    """
+
+    # Find user by uid
+    u = User.find_by_uid(user_id)
+    if not u:
+        raise NotFound(description="user not found")
+
+    # Decode the resume cursor
+    try:
+        kind, cursor = decode_stream_cursor(request.args.get("cursor"), EXPORT_KINDS)
+    except ValueError:
+        return {
+            "message": "validation error",
+            "errors": {"cursor": "invalid cursor"}
+        }, 400
+
+    chunk_size = current_app.config["EXPORT_CHUNK_SIZE"]
+
+    def generate():
+        # Send lines chunk by chunk, rows are not kept after being written
+        lines = list()
+        for k, row, info in u.export(user, kind, cursor, chunk_size):
+            lines.append(json.dumps({
+                "type": k[:-1],
+                "cursor": encode_stream_cursor(k, row),
+                "data": info
+            }))
+            if len(lines) >= chunk_size:
+                yield "\n".join(lines) + "\n"
+                lines = list()
+
+        lines.append(json.dumps({"type": "end"}))
+        yield "\n".join(lines) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
+@users.route("<user_id>/follow", methods=["POST"])
+@bearer_required
+def follow(user, user_id):
+    """ Follow a user, their posts show up in the home timeline """
+
+    # Find user by uid
+    u = User.find_by_uid(user_id)
+    if not u:
+        raise NotFound(description="user not found")
+
+    # Verify users do not follow themselves
+    try:
+        assert u.id != user.id
+    except AssertionError:
+        raise BadRequest(description="users can not follow themselves")
+
+    # Follow, unless already following
+    created = user.follow(u)
+    db.session.commit()
+
+    # Return a response
+    return Response(status=201 if created else 200)
+
+
+@users.route("<user_id>/follow", methods=["DELETE"])
+@bearer_required
+def unfollow(user, user_id):
+    """ Stop following a user """
+
+    # Find user by uid
+    u = User.find_by_uid(user_id)
+    if not u:
+        raise NotFound(description="user not found")
+
+    # Verify the user is being followed
+    try:
+        assert user.unfollow(u)
+    except AssertionError:
+        raise NotFound(description="user is not followed")
+    db.session.commit()
+
+    # Return a response
+    return Response(status=200)
+
 
 @users.route("me", methods=["GET"])
+@read_only
 @bearer_required
 def my_profile(user):
     """ Get my profile """
@@ -97,9 +235,10 @@ def update(user, data):
     except ValidationError as e:
         return helpers.errors_to_response(e.errors())
 
-    # Verify email is not taken
+    # Verify email is not taken by another user
     try:
-        assert not User.find_by_email(parsed.email)
+        existing = User.find_by_email(parsed.email)
+        assert not existing or existing is user
     except AssertionError:
         return {
             "message": "validation error",
@@ -125,6 +264,12 @@ def update(user, data):
 def delete(user):
     """ Delete current user """
 
+    # Large accounts may be deleted in the background
+    if current_app.config["USER_DELETE_ASYNC"]:
+        user.delete_later()
+        db.session.commit()
+        return Response(status=202)
+
     # Delete user
     user.delete()
     db.session.commit()
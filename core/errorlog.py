@@ -0,0 +1,154 @@
+"""
+Buffered exceptions log
+Records are queued by the failing request and written as JSON lines by a background thread,
+in batches, to a file rotated by size. Records are dropped (and counted) while the queue is full
+"""
+
+
+# Imports
+import atexit
+import json
+import os
+import queue
+import threading
+import traceback
+from datetime import datetime
+from flask import g, has_request_context, request
+
+
+# Functions
+def make_record(e):
+    """ Generate a structured record of an exception, with the request path and user uid """
+
+    record = {
+        "time": datetime.now().isoformat(),
+        "level": "ERROR",
+        "error": type(e).__name__,
+        "message": str(e),
+        "method": None,
+        "path": None,
+        "uid": None,
+        "traceback": "".join(traceback.format_exception(type(e), e, e.__traceback__))
+    }
+
+    if has_request_context():
+        record["method"] = request.method
+        record["path"] = request.path
+        record["uid"] = g.get("uid")
+
+    return record
+
+
+# Log
+class ErrorLog(object):
+    """ Queue-backed JSON lines log, drained by a daemon thread """
+
+    def __init__(self, path, max_bytes, backups, queue_size, batch_size):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def emit(self, record):
+        """ Queue a record without waiting, returns False in case it has been dropped """
+
+        self.start()
+        try:
+            self.queue.put_nowait(record)
+            return True
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            return False
+
+    def start(self):
+        """ Start the writer thread on first use """
+
+        if self.thread is not None:
+            return
+
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="errorlog", daemon=True)
+                self.thread.start()
+
+    def flush(self):
+        """ Wait until every queued record has been written """
+
+        if self.thread is not None:
+            self.queue.join()
+
+    def run(self):
+        """ Write queued records in batches """
+
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self.write(batch)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def write(self, batch):
+        """ Append a batch of records, with a note of records dropped since the last batch """
+
+        with self.lock:
+            dropped, self.dropped = self.dropped, 0
+
+        lines = [json.dumps(r, default=str) for r in batch]
+        if dropped:
+            lines.append(json.dumps({
+                "time": datetime.now().isoformat(),
+                "level": "WARNING",
+                "message": "exceptions log queue full",
+                "dropped": dropped
+            }))
+        data = "\n".join(lines) + "\n"
+
+        self.rotate(len(data))
+        with open(self.path, "a") as f:
+            f.write(data)
+
+    def rotate(self, incoming):
+        """ Shift log.1 ... log.<backups> in case the file would outgrow max_bytes """
+
+        if not self.max_bytes or not os.path.exists(self.path):
+            return
+        if os.path.getsize(self.path) + incoming <= self.max_bytes:
+            return
+
+        if not self.backups:
+            os.remove(self.path)
+            return
+
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+
+def create_log(config):
+    """ Create the exceptions log from the app config """
+
+    error_log = ErrorLog(
+        config["ERROR_LOG_FILE"],
+        config["ERROR_LOG_MAX_BYTES"],
+        config["ERROR_LOG_BACKUPS"],
+        config["ERROR_LOG_QUEUE_SIZE"],
+        config["ERROR_LOG_BATCH_SIZE"]
+    )
+    atexit.register(error_log.flush)
+    return error_log
@@ -5,21 +5,20 @@ Returns json in case of an exception, writes to log in case of internal errors
 
 
 # Imports
-from datetime import datetime as dt
 from werkzeug.exceptions import HTTPException
+from . import app
+from .errorlog import create_log, make_record
 
 
 # Log writer
-LOG = "exceptions.txt"
-def log(file, txt):
+error_log = create_log(app.config)
+def log(e):
     """
-    Write to a log file of choise
+    Queue an internal error for the exceptions log,
+    records are written in the background
     """
 
-    with open(file, "a") as f:
-        f.write(
-            f"[{dt.now()} [ERROR] [{txt}]\n"
-        )
+    error_log.emit(make_record(e))
 
 
 # Handlers
@@ -34,7 +33,7 @@ def handler(e):
     # Write to log internal errors
     if isinstance(e, HTTPException):
         if e.code == 500:
-            log(LOG, e.original_exception)
+            log(e.original_exception or e)
             return msg_500
         
         # Return error json
@@ -43,5 +42,5 @@ def handler(e):
             "message": "could not complete your request"
         }, e.code
     
-    log(LOG, e)
-    return msg_500
\ No newline at end of file
+    log(e)
+    return msg_500
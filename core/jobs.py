@@ -0,0 +1,293 @@
+"""
+Background jobs
+Jobs are kept in a local SQLite queue (JOBS_DATABASE_URL, the "jobs" bind) and run by
+"flask jobs-worker" on a thread pool, with retries and optional idempotency keys
+Jobs are enqueued into an outbox table of the primary database, within the request's transaction,
+and moved to the queue once it commits, or by the worker in case the queue could not be written
+"""
+
+
+# Imports
+import importlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text, and_, event, or_, select
+from sqlalchemy.exc import OperationalError
+from . import app, db
+from .database import RoutingSession
+from .exceptions import log
+
+
+# Model
+class Job(db.Model):
+    """ Jobs table, stored in the jobs database """
+
+    __bind_key__ = "jobs"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(255))
+    args = Column(Text)
+    key = Column(String(255), unique=True)
+    status = Column(String(16))
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer)
+    run_at = Column(DateTime)
+    locked_at = Column(DateTime, default=None)
+    last_error = Column(Text, default=None)
+    created = Column(DateTime)
+    updated = Column(DateTime)
+
+    # Back claiming due jobs
+    __table_args__ = (
+        Index("ix_job_status_run_at", "status", "run_at"),
+    )
+
+
+class JobOutbox(db.Model):
+    """ Jobs enqueued in committed transactions, not yet moved to the jobs database """
+
+    __tablename__ = "job_outbox"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(255))
+    args = Column(Text)
+    key = Column(String(255))
+    max_attempts = Column(Integer)
+    run_at = Column(DateTime)
+    created = Column(DateTime)
+
+
+# Functions
+_created = set()
+
+def engine():
+    """ Get the jobs database engine, creating the jobs table on first use """
+
+    e = db.get_engine(bind="jobs")
+    if e.url not in _created:
+        Job.__table__.create(e, checkfirst=True)
+        _created.add(e.url)
+    return e
+
+def name_of(f):
+    """ Get the importable "module:qualified.name" of a function """
+
+    return f"{f.__module__}:{f.__qualname__}"
+
+def resolve(name):
+    """ Import a function from its "module:qualified.name" """
+
+    module, _, qualname = name.partition(":")
+    obj = importlib.import_module(module)
+    for attr in qualname.split("."):
+        obj = getattr(obj, attr)
+    return obj
+
+def enqueue(f, *args, key=None, delay=0, max_attempts=None, **kwargs):
+    """
+    Queue f(*args, **kwargs) to run in the background once the current session commits,
+    arguments must be JSON serializable
+    A job with the key of a job still kept in the queue is dropped (idempotency)
+    """
+
+    now = datetime.now()
+    db.session.add(JobOutbox(
+        name=name_of(f),
+        args=json.dumps([args, kwargs]),
+        key=key,
+        max_attempts=max_attempts or current_app.config["JOB_MAX_ATTEMPTS"],
+        run_at=now + timedelta(seconds=delay),
+        created=now
+    ))
+    db.session.info["jobs_enqueued"] = True
+
+def relay(limit=1000):
+    """
+    Move up to limit jobs from the outbox to the jobs database, returns the number moved
+    Outbox rows are deleted in the same transaction as they are read, so two relays never move a job twice
+    """
+
+    t = JobOutbox.__table__
+    with db.engine.begin() as conn:
+        rows = conn.execute(select(t).order_by(t.c.id).limit(limit)).all()
+        moved = [r for r in rows if conn.execute(t.delete().where(t.c.id == r.id)).rowcount]
+        if moved:
+            with engine().begin() as jobs_conn:
+                jobs_conn.execute(Job.__table__.insert().prefix_with("OR IGNORE"), [dict(
+                    name=r.name,
+                    args=r.args,
+                    key=r.key,
+                    status="queued",
+                    attempts=0,
+                    max_attempts=r.max_attempts,
+                    run_at=r.run_at,
+                    created=r.created,
+                    updated=r.created
+                ) for r in moved])
+    return len(moved)
+
+@event.listens_for(RoutingSession, "after_commit")
+def relay_enqueued(session):
+    """ Move jobs enqueued within the committed transaction to the queue right away """
+
+    if not session.info.pop("jobs_enqueued", None):
+        return
+
+    # The request data is committed, jobs left in the outbox are moved by the worker
+    try:
+        relay()
+    except Exception as e:
+        log(e)
+
+@event.listens_for(RoutingSession, "after_soft_rollback")
+def forget_enqueued(session, previous_transaction):
+    """ Jobs of a rolled back transaction are rolled back with their outbox rows """
+
+    if not previous_transaction.nested:
+        session.info.pop("jobs_enqueued", None)
+
+def claim(limit):
+    """
+    Mark up to limit due jobs as running and return them
+    Jobs whose lease was not renewed for JOB_LEASE seconds (crashed worker) are claimed again
+    """
+
+    t = Job.__table__
+    now = datetime.now()
+    stale = now - timedelta(seconds=current_app.config["JOB_LEASE"])
+    due = or_(
+        and_(t.c.status == "queued", t.c.run_at <= now),
+        and_(t.c.status == "running", t.c.locked_at < stale)
+    )
+
+    claimed = list()
+    try:
+        with engine().begin() as conn:
+            rows = conn.execute(select(t).where(due).order_by(t.c.run_at, t.c.id).limit(limit)).all()
+            for row in rows:
+                # Another worker may have claimed the job in the meantime
+                result = conn.execute(
+                    t.update()
+                    .where(t.c.id == row.id, t.c.status == row.status, t.c.attempts == row.attempts)
+                    .values(status="running", locked_at=now, attempts=row.attempts + 1, updated=now)
+                )
+                if result.rowcount:
+                    claimed.append(row)
+    except OperationalError:
+        # Queue locked by another worker, try again on the next poll
+        return list()
+
+    return claimed
+
+def execute(job):
+    """ Run a claimed job within an app context and record the outcome """
+
+    with app.app_context():
+        error = None
+        try:
+            args, kwargs = json.loads(job.args)
+            resolve(job.name)(*args, **kwargs)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            log(e)
+            error = repr(e)
+        finally:
+            db.session.remove()
+
+        finish(job, error)
+
+def renew(jobs):
+    """ Extend the lease of jobs still running on this worker """
+
+    t = Job.__table__
+    now = datetime.now()
+    try:
+        with engine().begin() as conn:
+            for job in jobs:
+                conn.execute(
+                    t.update()
+                    .where(t.c.id == job.id, t.c.status == "running", t.c.attempts == job.attempts + 1)
+                    .values(locked_at=now)
+                )
+    except OperationalError:
+        # Queue locked, renewed on the next poll well within the lease
+        pass
+
+def finish(job, error):
+    """ Mark a job done, or queue it again with an exponential backoff until it runs out of attempts """
+
+    t = Job.__table__
+    now = datetime.now()
+    attempts = job.attempts + 1
+
+    if error is None:
+        values = dict(status="done", last_error=None)
+    elif attempts < job.max_attempts:
+        delay = current_app.config["JOB_RETRY_DELAY"] * 2 ** (attempts - 1)
+        values = dict(status="queued", run_at=now + timedelta(seconds=delay), last_error=error)
+    else:
+        values = dict(status="failed", last_error=error)
+
+    # A job whose lease expired may be running on another worker, which records the outcome
+    with engine().begin() as conn:
+        conn.execute(
+            t.update()
+            .where(t.c.id == job.id, t.c.attempts == attempts)
+            .values(locked_at=None, updated=now, **values)
+        )
+
+def prune():
+    """ Drop done jobs older than JOB_RETENTION seconds, their keys may be used again """
+
+    t = Job.__table__
+    before = datetime.now() - timedelta(seconds=current_app.config["JOB_RETENTION"])
+    with engine().begin() as conn:
+        return conn.execute(t.delete().where(t.c.status == "done", t.c.updated < before)).rowcount
+
+def stats():
+    """ Count jobs by status """
+
+    t = Job.__table__
+    with engine().connect() as conn:
+        return dict(conn.execute(select(t.c.status, db.func.count()).group_by(t.c.status)).all())
+
+def work(threads, poll, once=False):
+    """
+    Claim and run jobs on a thread pool until interrupted,
+    or until the queue is drained in case once is set
+    Leases of running jobs are renewed every third of JOB_LEASE, however long they run
+    """
+
+    executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="job")
+    running = dict()
+    renewed = time.monotonic()
+    try:
+        while True:
+            try:
+                relay()
+            except OperationalError:
+                # Outbox or queue locked, try again on the next poll
+                pass
+
+            running = {f: job for f, job in running.items() if not f.done()}
+            if running and time.monotonic() - renewed > current_app.config["JOB_LEASE"] / 3:
+                renew(running.values())
+                renewed = time.monotonic()
+
+            jobs = claim(threads - len(running)) if len(running) < threads else list()
+            for job in jobs:
+                running[executor.submit(execute, job)] = job
+
+            if jobs:
+                continue
+            if once and not running:
+                return
+            if not running:
+                prune()
+            time.sleep(poll)
+    finally:
+        executor.shutdown(wait=True)
@@ -0,0 +1,44 @@
+"""
+Request rate limiting
+    1. Per-user quotas of each blueprint (RATELIMIT_BLUEPRINTS), anonymous requests count per IP
+    2. Per-IP quota of credentials endpoints (RATELIMIT_AUTH)
+Counters live in RATELIMIT_STORAGE_URI, in-memory by default (per process)
+"""
+
+
+# Imports
+from flask import request
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from jwt.exceptions import PyJWTError
+from .decorators import decode_token
+
+
+# Functions
+def rate_limit_key():
+    """
+    Get the rate limiting key of the current request:
+    the token uid for authenticated requests, the client IP otherwise
+    Limits are checked before the route runs, hence the token is decoded (cached) here
+    """
+
+    header = request.headers.get("Authorization", "")
+    if header:
+        try:
+            return "uid:" + decode_token(header[7:])["uid"]
+        except (PyJWTError, KeyError):
+            pass
+
+    return "ip:" + get_remote_address()
+
+
+# Limiter
+limiter = Limiter(key_func=rate_limit_key)
+
+def init_limiter(app):
+    """ Attach the limiter to the app and apply blueprint quotas """
+
+    limiter.init_app(app)
+    for name, quota in app.config["RATELIMIT_BLUEPRINTS"].items():
+        if quota:
+            limiter.limit(quota)(app.blueprints[name])
@@ -0,0 +1,197 @@
+"""
+Request instrumentation (enabled by METRICS_ENABLED)
+    1. Records wall time, SQL statements and time, serialization time and response size per endpoint
+    2. Reports the current request through the Server-Timing header
+    3. Exposes totals in the Prometheus text format at GET /metrics
+Totals are kept per process
+"""
+
+
+# Imports
+import time
+from threading import Lock
+from flask import Blueprint, Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# Registry
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+class Registry(object):
+    """ Per-endpoint request totals and wall time histogram """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.endpoints = dict()
+
+    def record(self, endpoint, wall, sql_count, sql_time, json_time, size):
+        with self.lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = {
+                    "requests": 0,
+                    "seconds": 0.0,
+                    "sql_statements": 0,
+                    "sql_seconds": 0.0,
+                    "serialization_seconds": 0.0,
+                    "response_bytes": 0,
+                    "buckets": [0] * len(BUCKETS)
+                }
+
+            stats["requests"] += 1
+            stats["seconds"] += wall
+            stats["sql_statements"] += sql_count
+            stats["sql_seconds"] += sql_time
+            stats["serialization_seconds"] += json_time
+            stats["response_bytes"] += size
+            for i, bound in enumerate(BUCKETS):
+                if wall <= bound:
+                    stats["buckets"][i] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {k: dict(v, buckets=list(v["buckets"])) for k, v in self.endpoints.items()}
+
+registry = Registry()
+
+
+# Functions
+def tracking():
+    """ Check whether the current request is being measured """
+
+    return has_request_context() and "metrics_start" in g
+
+def start_timer():
+    """ Reset the counters of the current request """
+
+    g.metrics_start = time.perf_counter()
+    g.metrics_sql_count = 0
+    g.metrics_sql_time = 0.0
+    g.metrics_json_time = 0.0
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if tracking():
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if tracking() and conn.info.get("metrics_query_start"):
+        g.metrics_sql_count += 1
+        g.metrics_sql_time += time.perf_counter() - conn.info["metrics_query_start"].pop()
+
+def timed_encoder(encoder):
+    """ Subclass a JSON encoder to add its encoding time to the current request """
+
+    class TimedEncoder(encoder):
+        def encode(self, o):
+            if not tracking():
+                return super().encode(o)
+
+            start = time.perf_counter()
+            try:
+                return super().encode(o)
+            finally:
+                g.metrics_json_time += time.perf_counter() - start
+
+    TimedEncoder.__name__ = "Timed" + encoder.__name__
+    return TimedEncoder
+
+def record_request(response):
+    """ Record the current request and report it in the Server-Timing header """
+
+    if not tracking():
+        return response
+
+    wall = time.perf_counter() - g.metrics_start
+    size = response.calculate_content_length() or 0
+    registry.record(
+        request.endpoint or "unmatched",
+        wall,
+        g.metrics_sql_count,
+        g.metrics_sql_time,
+        g.metrics_json_time,
+        size
+    )
+
+    response.headers["Server-Timing"] = ", ".join([
+        f"app;dur={wall * 1000:.2f}",
+        f'db;dur={g.metrics_sql_time * 1000:.2f};desc="{g.metrics_sql_count} queries"',
+        f"json;dur={g.metrics_json_time * 1000:.2f}"
+    ])
+    return response
+
+def cache_stats():
+    """ Get stats of the caches supporting them """
+
+    from .decorators import token_cache
+    from .models import feed_cache, user_cache
+
+    caches = {"token": token_cache, "user": user_cache, "feed": feed_cache}
+    return {k: c.stats() for k, c in caches.items() if hasattr(c, "stats")}
+
+def render():
+    """ Generate the Prometheus text exposition of the registry and caches """
+
+    lines = list()
+
+    def family(name, kind, help):
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    endpoints = registry.snapshot()
+    totals = [
+        ("http_requests_total", "requests", "Requests handled"),
+        ("http_sql_statements_total", "sql_statements", "SQL statements executed"),
+        ("http_sql_seconds_total", "sql_seconds", "Time spent executing SQL"),
+        ("http_serialization_seconds_total", "serialization_seconds", "Time spent encoding JSON"),
+        ("http_response_bytes_total", "response_bytes", "Response body bytes")
+    ]
+    for name, key, help in totals:
+        family(name, "counter", help)
+        for endpoint, stats in sorted(endpoints.items()):
+            lines.append(f'{name}{{endpoint="{endpoint}"}} {stats[key]}')
+
+    family("http_request_duration_seconds", "histogram", "Request wall time")
+    for endpoint, stats in sorted(endpoints.items()):
+        for bound, count in zip(BUCKETS, stats["buckets"]):
+            lines.append(f'http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}')
+        lines.append(f'http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {stats["requests"]}')
+        lines.append(f'http_request_duration_seconds_sum{{endpoint="{endpoint}"}} {stats["seconds"]}')
+        lines.append(f'http_request_duration_seconds_count{{endpoint="{endpoint}"}} {stats["requests"]}')
+
+    caches = cache_stats()
+    series = [
+        ("cache_hits_total", "counter", "hits", "Cache hits"),
+        ("cache_misses_total", "counter", "misses", "Cache misses"),
+        ("cache_entries", "gauge", "size", "Cached entries")
+    ]
+    for name, kind, key, help in series:
+        family(name, kind, help)
+        for cache, stats in sorted(caches.items()):
+            lines.append(f'{name}{{cache="{cache}"}} {stats[key]}')
+
+    return "\n".join(lines) + "\n"
+
+
+# Blueprint
+metrics = Blueprint(name="metrics", import_name=__name__)
+
+@metrics.route("/metrics", methods=["GET"])
+def export():
+    """ Get metrics in the Prometheus text format """
+
+    return Response(render(), mimetype="text/plain; version=0.0.4")
+
+
+def init_metrics(app):
+    """ Instrument the app in case METRICS_ENABLED is set """
+
+    if not app.config["METRICS_ENABLED"]:
+        return
+
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", after_cursor_execute)
+    app.json_encoder = timed_encoder(app.json_encoder)
+    app.before_request(start_timer)
+    app.after_request(record_request)
+    app.register_blueprint(metrics)
@@ -4,21 +4,35 @@ ORM for the app DB
 
 
 # Imports
+import os
 import random
 from datetime import datetime
 from flask import request
 import shortuuid
-import timeago
-from werkzeug.security import generate_password_hash
-from . import db
+from werkzeug.utils import import_string
+from . import app, db, jobs, search_index
+from .cache import TTLCache
+from .database import RoutingSession
+from .passwords import hash_password, verify_password
 from sqlalchemy import (
     Column,
     Integer,
     String,
     DateTime,
     ForeignKey,
-    desc
+    Index,
+    case,
+    desc,
+    event,
+    func,
+    literal,
+    or_,
+    select,
+    tuple_
 )
+from sqlalchemy.orm import joinedload, make_transient_to_detached
+from .pagination import keyset, next_cursor
+from .timestamps import render_time, time_format
 
 
 # Functions
@@ -29,9 +43,70 @@ def uuid_gen(l):
     """
     return shortuuid.ShortUUID().random(length=l)
 
+def uuid_batch(n, l):
+    """
+    generate n random strings of the uuid_gen alphabet,
+    drawing os.urandom() once per batch
+    """
+    alphabet = shortuuid.get_alphabet()
+    limit = 256 - 256 % len(alphabet)
+    result = list()
+    while len(result) < n:
+        chars = [alphabet[b % len(alphabet)] for b in os.urandom((n - len(result)) * l * 2) if b < limit]
+        for i in range(0, len(chars) - l + 1, l):
+            if len(result) == n:
+                break
+            result.append("".join(chars[i:i + l]))
+    return result
+
 def hex_gen():
     return "#"+''.join([random.choice('0123456789ABCDEF') for i in range(6)])
 
+def get_actions(owned):
+    """ Get actions available to the viewer of a post or a comment """
+
+    return ["View", "Edit", "Delete"] if owned else ["View"]
+
+
+# Kinds of rows of a user export, in stream order
+EXPORT_KINDS = ("posts", "comments")
+
+
+# Caches
+user_cache = TTLCache(app.config["USER_CACHE_SIZE"], app.config["USER_CACHE_TTL"])
+feed_cache = import_string(app.config["FEED_CACHE_BACKEND"])(
+    app.config["FEED_CACHE_SIZE"],
+    app.config["FEED_CACHE_TTL"]
+)
+
+def invalidate_user(uid):
+    """ Drop a cached user once the current transaction commits """
+
+    db.session.info.setdefault("invalidate_users", set()).add(uid)
+
+def invalidate_feed():
+    """ Drop cached feed pages once the current transaction commits """
+
+    db.session.info["invalidate_feed"] = True
+
+@event.listens_for(RoutingSession, "after_commit")
+def apply_invalidations(session):
+    """ Invalidate caches after the commit, so concurrent reads cannot cache rows about to change """
+
+    for uid in session.info.pop("invalidate_users", ()):
+        user_cache.delete(uid)
+    if session.info.pop("invalidate_feed", False):
+        feed_cache.clear()
+
+@event.listens_for(RoutingSession, "after_soft_rollback")
+def forget_invalidations(session, previous_transaction):
+    """ Cached rows are still current after a rollback """
+
+    if not previous_transaction.nested:
+        session.info.pop("invalidate_users", None)
+        session.info.pop("invalidate_feed", None)
+
+
 # Models
 class User(db.Model):
     """ Users table """
@@ -39,14 +114,17 @@ class User(db.Model):
     id = Column(Integer, primary_key=True)
     uid = Column(String(16), unique=True)
     email = Column(String(50), unique=True)
-    password = Column(String(100))
+    password = Column(String(255))
     display_name = Column(String(50))
     color = Column(String(7))
+    follower_count = Column(Integer, nullable=False, default=0, server_default="0")
+    fanout_resumed = Column(DateTime, default=None)
     created = Column(DateTime, default=None)
     updated = Column(DateTime, default=None)
 
-    posts = db.relationship("Post", backref="owner", lazy="dynamic", cascade="all, delete")
-    comments = db.relationship("Comment", backref="owner", lazy="dynamic", cascade="all, delete")
+    # Children are removed with bulk statements, see User.purge and Post.delete
+    posts = db.relationship("Post", backref="owner", lazy="dynamic", cascade="all, delete", passive_deletes=True)
+    comments = db.relationship("Comment", backref="owner", lazy="dynamic", cascade="all, delete", passive_deletes=True)
 
     @staticmethod
     def find_by_id(id):
@@ -60,6 +138,30 @@ class User(db.Model):
 
         return db.session.query(User).filter_by(uid=uid).first()
 
+    @staticmethod
+    def find_by_uids(uids):
+        """ Get users by UID with a single query, mapped by UID """
+
+        users = db.session.query(User).filter(User.uid.in_(uids))
+        return {u.uid: u for u in users}
+
+    @staticmethod
+    def find_by_uid_cached(uid):
+        """
+        Find a user by UID through the in-process user cache
+        Cache hits are merged into the current session without querying the DB,
+        they may outlive the user by USER_CACHE_TTL, so only read-only routes use it
+        """
+
+        cached = user_cache.get(uid)
+        if cached is not None:
+            return db.session.merge(cached, load=False)
+
+        user = User.find_by_uid(uid)
+        if user:
+            user_cache.set(uid, user.detached_copy())
+        return user
+
     @staticmethod
     def find_by_email(email):
         """ Find a user by email """
@@ -75,7 +177,7 @@ class User(db.Model):
         new = User(
             uid=uuid_gen(16),
             email=email.lower(),
-            password=generate_password_hash(pwd, "SHA256"),
+            password=hash_password(pwd),
             display_name=display_name,
             color=hex_gen(),
             created=now,
@@ -84,6 +186,11 @@ class User(db.Model):
         db.session.add(new)
         return new
 
+    def validator(self):
+        """ Get values that change whenever the user public info does """
+
+        return (self.uid, self.updated)
+
     def private_info(self):
         """ Get user private info """
 
@@ -92,8 +199,8 @@ class User(db.Model):
             "display_name": self.display_name,
             "email": self.email,
             "color": self.color,
-            "created": self.created,
-            "updated": self.updated
+            "created": render_time(self.created),
+            "updated": render_time(self.updated)
         }
 
     def public_info(self):
@@ -105,28 +212,333 @@ class User(db.Model):
             "color": self.color
         }
 
+    def detached_copy(self):
+        """ Copy current row into a clean instance that belongs to no session """
+
+        copy = User(**{c.key: getattr(self, c.key) for c in User.__table__.columns})
+        make_transient_to_detached(copy)
+        return copy
+
+    def check_password(self, pwd):
+        """ Verify a password against the stored hash """
+
+        return verify_password(self.password, pwd)
+
+    def set_password(self, pwd):
+        """ Hash and store a new password """
+
+        invalidate_user(self.uid)
+        self.password = hash_password(pwd)
+
     def update(self, email, pwd, display_name):
-        """ Update user info """
+        """
+        Update user info
+        The password is only hashed in case it was provided, without verifying the current one first
+        """
 
+        invalidate_user(self.uid)
+        invalidate_feed()
         self.email = email.lower()
-        self.password = generate_password_hash(pwd, "SHA256")
+        if pwd is not None:
+            self.set_password(pwd)
         self.display_name = display_name
         self.updated = datetime.now()
 
     def delete(self):
-        """ Delete current row """
-        
-        db.session.delete(self)
+        """
+        Delete current row along with user posts and comments,
+        using set-based statements instead of loading every child row
+        """
+
+        invalidate_user(self.uid)
+        User.purge(self.id)
+        db.session.expunge(self)
+
+    def delete_later(self):
+        """ Delete current row along with user posts and comments in the background """
 
-    def get_posts(self, offset=0, limit=20):
+        invalidate_user(self.uid)
+        jobs.enqueue(User.purge, self.id, app.config["USER_DELETE_CHUNK"], key=f"purge:{self.uid}")
+
+    @staticmethod
+    def purge(user_id, chunk_size=None):
+        """
+        Delete a user, their comments and their posts (with the comments they hold)
+        using bulk DELETE statements in dependency order
+        Without a chunk_size everything runs within the caller's transaction,
+        with one, rows are deleted chunk by chunk and committed in between
+        so that no transaction holds the write lock for long
+        """
+
+        def run(ids, delete):
+            if not chunk_size:
+                delete(ids)
+                return
+
+            while True:
+                chunk = [id for (id,) in db.session.execute(ids.limit(chunk_size))]
+                if not chunk:
+                    break
+                delete(chunk)
+                invalidate_feed()
+                db.session.commit()
+
+        def delete_user_comments(ids):
+            search_index.unindex("comments", ids)
+
+            # Discount comments from the counters of the posts they were left on
+            count = select(func.count(Comment.id)) \
+                .where(Comment.post_id == Post.id, Comment.id.in_(ids)) \
+                .scalar_subquery()
+            commented = select(Comment.post_id).where(Comment.id.in_(ids))
+            db.session.query(Post) \
+                .filter(Post.id.in_(commented)) \
+                .update({Post.comment_count: Post.comment_count - count}, synchronize_session=False)
+
+            db.session.query(Comment).filter(Comment.id.in_(ids)).delete(synchronize_session=False)
+
+        def delete_comments(ids):
+            search_index.unindex("comments", ids)
+            db.session.query(Comment).filter(Comment.id.in_(ids)).delete(synchronize_session=False)
+
+        def delete_posts(ids):
+            search_index.unindex("posts", ids)
+            Timeline.remove(ids)
+            db.session.query(Post).filter(Post.id.in_(ids)).delete(synchronize_session=False)
+
+        uid = db.session.query(User.uid).filter_by(id=user_id).scalar()
+        user_posts = select(Post.id).where(Post.owner_id == user_id)
+
+        run(select(Comment.id).where(Comment.owner_id == user_id), delete_user_comments)
+        run(select(Comment.id).where(Comment.post_id.in_(user_posts)), delete_comments)
+        run(user_posts, delete_posts)
+
+        # Leave the follow graph: discount followed users, drop edges and the home timeline
+        followed = select(Follow.followee_id).where(Follow.follower_id == user_id)
+        db.session.query(User) \
+            .filter(User.id.in_(followed)) \
+            .update(User.discounted(), synchronize_session=False)
+        db.session.query(Follow) \
+            .filter(or_(Follow.follower_id == user_id, Follow.followee_id == user_id)) \
+            .delete(synchronize_session=False)
+        db.session.query(Timeline).filter_by(user_id=user_id).delete(synchronize_session=False)
+
+        db.session.query(User).filter_by(id=user_id).delete(synchronize_session=False)
+
+        invalidate_user(uid)
+        invalidate_feed()
+
+        if chunk_size:
+            db.session.commit()
+
+    def get_posts(self, offset=0, limit=20, cursor=None):
         """ Get user posts """
 
+        if cursor is not None:
+            return keyset(self.posts, Post, cursor).limit(limit)
+
         return self.posts.order_by(desc(Post.created)).offset(offset).limit(limit)
 
-    def get_comments(self, offset=0, limit=20):
-        """ Get user comments """
+    def get_comments(self, offset=0, limit=20, cursor=None):
+        """ Get user comments, with the post of every comment """
+
+        query = self.comments.options(joinedload(Comment.post))
+        if cursor is not None:
+            return keyset(query, Comment, cursor).limit(limit)
+
+        return query.offset(offset).limit(limit)
+
+    def export(self, viewer, kind, cursor, chunk_size):
+        """
+        Yield (kind, row, public info) of every user post, then every user comment,
+        newest first, starting after the cursor of the given kind
+        Rows are fetched chunk_size at a time, the owner is the current user
+        and needs no extra query
+        """
+
+        queries = {
+            "posts": self.posts,
+            "comments": self.comments.options(joinedload(Comment.post))
+        }
+        models = {"posts": Post, "comments": Comment}
+
+        for k in EXPORT_KINDS[EXPORT_KINDS.index(kind):]:
+            query = keyset(queries[k], models[k], cursor if k == kind else tuple())
+            for row in query.yield_per(chunk_size):
+                yield k, row, row.public_info(viewer)
+
+    @staticmethod
+    def discounted():
+        """
+        Values dropping a follower, remembering when a user falls back to TIMELINE_FANOUT_LIMIT followers:
+        their earlier posts may not have been fanned out and are merged into home timelines at read time
+        """
+
+        return {
+            User.follower_count: User.follower_count - 1,
+            User.fanout_resumed: case(
+                (User.follower_count == app.config["TIMELINE_FANOUT_LIMIT"] + 1, datetime.now()),
+                else_=User.fanout_resumed
+            )
+        }
+
+    def is_celebrity(self):
+        """ Check whether the user has too many followers for their posts to be fanned out """
+
+        return self.follower_count > app.config["TIMELINE_FANOUT_LIMIT"]
+
+    def is_following(self, other):
+        """ Check whether the user follows another user """
+
+        return db.session.get(Follow, (self.id, other.id)) is not None
+
+    def follow(self, other):
+        """
+        Follow another user, their latest posts are copied to the home timeline
+        (unless they are merged at read time)
+        Returns False in case the user already follows them
+        """
+
+        if self.is_following(other):
+            return False
+
+        invalidate_user(other.uid)
+        db.session.add(Follow(follower_id=self.id, followee_id=other.id, created=datetime.now()))
+        other.follower_count = User.follower_count + 1
+        db.session.flush()
+
+        if not other.is_celebrity():
+            latest = select(literal(self.id), Post.created, Post.id) \
+                .where(Post.owner_id == other.id) \
+                .order_by(desc(Post.created), desc(Post.id)) \
+                .limit(app.config["TIMELINE_BACKFILL"])
+            db.session.execute(
+                Timeline.__table__.insert().from_select(["user_id", "created", "post_id"], latest)
+            )
+        return True
+
+    def unfollow(self, other):
+        """
+        Stop following another user and drop their posts from the home timeline
+        Returns False in case the user does not follow them
+        """
+
+        edge = db.session.get(Follow, (self.id, other.id))
+        if edge is None:
+            return False
+
+        invalidate_user(other.uid)
+        db.session.delete(edge)
+        for attr, value in User.discounted().items():
+            setattr(other, attr.key, value)
+        db.session.query(Timeline) \
+            .filter(Timeline.user_id == self.id, Timeline.post_id.in_(select(Post.id).where(Post.owner_id == other.id))) \
+            .delete(synchronize_session=False)
+        return True
+
+    def get_home(self, offset=0, limit=20, cursor=None):
+        """
+        Get the home timeline: posts of the user and of followed users, newest first
+        Fanned out posts are a range scan of the timeline table, posts of followed celebrities
+        and posts of former celebrities from before they were fanned out again are merged in at read time
+        """
+
+        wanted = offset + limit
+        fanned = db.session.query(Timeline.post_id, Timeline.created) \
+            .filter(Timeline.user_id == self.id)
+        not_fanned = or_(
+            User.follower_count > app.config["TIMELINE_FANOUT_LIMIT"],
+            Post.created < User.fanout_resumed
+        )
+        owners = select(User.id) \
+            .join(Follow, Follow.followee_id == User.id) \
+            .where(
+                Follow.follower_id == self.id,
+                or_(User.follower_count > app.config["TIMELINE_FANOUT_LIMIT"], User.fanout_resumed.isnot(None))
+            )
+        merged = db.session.query(Post.id, Post.created) \
+            .join(User, User.id == Post.owner_id) \
+            .filter(Post.owner_id.in_(owners), not_fanned)
+
+        if cursor:
+            fanned = fanned.filter(tuple_(Timeline.created, Timeline.post_id) < tuple_(*cursor))
+            merged = merged.filter(tuple_(Post.created, Post.id) < tuple_(*cursor))
+
+        entries = fanned.order_by(desc(Timeline.created), desc(Timeline.post_id)).limit(wanted).all()
+        entries += merged.order_by(desc(Post.created), desc(Post.id)).limit(wanted).all()
+
+        # Posts fanned out before their owner became a celebrity come up twice
+        ordered = sorted({tuple(e) for e in entries}, key=lambda e: (e[1], e[0]), reverse=True)
+        ids = [id for id, _ in ordered[offset:wanted]]
+        if not ids:
+            return list()
+
+        posts = db.session.query(Post).options(joinedload(Post.owner)).filter(Post.id.in_(ids))
+        found = {p.id: p for p in posts}
+        return [found[id] for id in ids if id in found]
+
+
+class Follow(db.Model):
+    """ Follow graph, one row per (follower, followed user) """
+
+    follower_id = Column(Integer, ForeignKey("user.id"), primary_key=True)
+    followee_id = Column(Integer, ForeignKey("user.id"), primary_key=True)
+    created = Column(DateTime, default=None)
 
-        return self.comments.offset(offset).limit(limit)
+    # Back fan-out, which looks up the followers of a user
+    __table_args__ = (
+        Index("ix_follow_followee_id_follower_id", "followee_id", "follower_id"),
+    )
+
+
+class Timeline(db.Model):
+    """
+    Precomputed home timelines, one row per (reader, post)
+    The primary key orders rows of a reader by date, reads are a single range scan
+    """
+
+    user_id = Column(Integer, ForeignKey("user.id"), primary_key=True)
+    created = Column(DateTime, primary_key=True)
+    post_id = Column(Integer, ForeignKey("post.id"), primary_key=True)
+
+    # Back removal of deleted posts
+    __table_args__ = (
+        Index("ix_timeline_post_id", "post_id"),
+    )
+
+    @staticmethod
+    def fan_out(condition, owners=True, followers=True):
+        """
+        Add posts matching a condition to the timelines of their owners and of
+        their owners' followers, unless an owner has more than TIMELINE_FANOUT_LIMIT followers
+        Runs as INSERT ... SELECT statements, new posts must have been flushed
+        """
+
+        columns = ["user_id", "created", "post_id"]
+        if owners:
+            own = select(Post.owner_id, Post.created, Post.id).where(condition)
+            db.session.execute(Timeline.__table__.insert().from_select(columns, own))
+
+        if followers:
+            fanned = select(Follow.follower_id, Post.created, Post.id) \
+                .join(Follow, Follow.followee_id == Post.owner_id) \
+                .join(User, User.id == Post.owner_id) \
+                .where(condition, User.follower_count <= app.config["TIMELINE_FANOUT_LIMIT"])
+            db.session.execute(Timeline.__table__.insert().from_select(columns, fanned))
+
+    @staticmethod
+    def fan_out_post(post_id):
+        """ Add a post to its owner's followers' timelines (background job) """
+
+        Timeline.fan_out(Post.id == post_id, owners=False)
+
+    @staticmethod
+    def remove(post_ids):
+        """ Drop posts from every timeline, post_ids may be a list or a select of ids """
+
+        db.session.query(Timeline) \
+            .filter(Timeline.post_id.in_(post_ids)) \
+            .delete(synchronize_session=False)
 
 
 class Post(db.Model):
@@ -136,10 +548,17 @@ class Post(db.Model):
     uid = Column(String(16), unique=True)
     owner_id = Column(Integer, ForeignKey("user.id"))
     content = Column(String(5000))
+    comment_count = Column(Integer, nullable=False, default=0, server_default="0")
     created = Column(DateTime, default=None)
     updated = Column(DateTime, default=None)
 
-    comments = db.relationship("Comment", backref="post", lazy="dynamic", cascade="all, delete")
+    comments = db.relationship("Comment", backref="post", lazy="dynamic", cascade="all, delete", passive_deletes=True)
+
+    # Back keyset pagination of the feed and of user timelines
+    __table_args__ = (
+        Index("ix_post_created_id", "created", "id"),
+        Index("ix_post_owner_id_created_id", "owner_id", "created", "id"),
+    )
 
     @staticmethod
     def create(user, content):
@@ -154,58 +573,116 @@ class Post(db.Model):
             updated=now
         )
         db.session.add(new)
+        db.session.flush()
+        search_index.index("posts", [new])
+
+        # The owner reads the post right away, followers may get it from a background job
+        if app.config["TIMELINE_FANOUT_ASYNC"]:
+            Timeline.fan_out(Post.id == new.id, followers=False)
+            jobs.enqueue(Timeline.fan_out_post, new.id, key=f"fanout:{new.uid}")
+        else:
+            Timeline.fan_out(Post.id == new.id)
+        invalidate_feed()
         return new
 
     @staticmethod
-    def get_all(offset, limit):
-        """ Fetch all posts ordered by descending date """
+    def get_all(offset, limit, cursor=None):
+        """ Fetch all posts ordered by descending date, posts without an owner row are left out """
 
-        return db.session.query(Post).order_by(desc(Post.created)).offset(offset).limit(limit)
+        query = db.session.query(Post).options(joinedload(Post.owner, innerjoin=True))
+        if cursor is not None:
+            return keyset(query, Post, cursor).limit(limit)
 
+        return query.order_by(desc(Post.created)).offset(offset).limit(limit)
 
-    def public_info(self, user):
-        """ Get post public info """
-        
-        if self.owner is user:
-            actions = ["View", "Edit", "Delete"]
-        else:
-            actions = ["View"]
+    @staticmethod
+    def reconcile_comment_counts():
+        """
+        Recount comments of every post whose counter has drifted
+        Returns the number of repaired posts
+        """
+
+        count = select(func.count(Comment.id)) \
+            .where(Comment.post_id == Post.id) \
+            .scalar_subquery()
+        return db.session.query(Post) \
+            .filter(Post.comment_count != count) \
+            .update({Post.comment_count: count}, synchronize_session=False)
+
+    @staticmethod
+    def get_feed(offset, limit, cursor):
+        """
+        Get a feed page shared by all users: posts info without the
+        viewer dependent actions, the next page cursor and the page validator
+        Pages are cached until a write invalidates them
+        """
+
+        key = ("feed", time_format(), offset, limit, cursor)
+        page = feed_cache.get(key)
+        if page is None:
+            posts = Post.get_all(offset, limit, cursor).all()
+            page = {
+                "items": [p.shared_info() for p in posts],
+                "next_cursor": next_cursor(posts, limit),
+                "validator": [p.validator() for p in posts]
+            }
+            feed_cache.set(key, page)
+
+        return page
+
+    @staticmethod
+    def feed_info(page, user):
+        """ Get feed page posts info with the actions of the current user """
+
+        return [
+            dict(item, actions=get_actions(item["owner"]["id"] == user.uid))
+            for item in page["items"]
+        ]
+
+    def validator(self):
+        """ Get values that change whenever the post public info does """
+
+        return (self.uid, self.updated, self.comment_count, self.owner.updated)
+
+    def shared_info(self):
+        """ Get post public info shared by all viewers """
 
         return {
             "id": self.uid,
             "content": self.content,
-            "created": timeago.format(datetime.now() - self.created),
-            "updated": self.updated,
-            "comments": self.comments.count(),
+            "created": render_time(self.created, humanize=True),
+            "updated": render_time(self.updated),
+            "comments": self.comment_count,
             "owner": {
                 "id": self.owner.uid,
                 "display_name": self.owner.display_name,
                 "color": self.owner.color
-            },
-            "actions": actions
+            }
         }
 
+    def public_info(self, user):
+        """ Get post public info """
+
+        info = self.shared_info()
+        info["actions"] = get_actions(self.owner is user)
+        return info
+
     def short_info(self, user):
         """ Get post short info """
 
-        if self.owner is user:
-            actions = ["View", "Edit", "Delete"]
-        else:
-            actions = ["View"]
-
         return {
             "id": self.uid,
             "content": self.trimmed_content(),
-            "created": timeago.format(datetime.now() - self.created),
-            "updated": self.updated,
-            "comments": self.comments.count(),
+            "created": render_time(self.created, humanize=True),
+            "updated": render_time(self.updated),
+            "comments": self.comment_count,
             "href": f"{request.base_url}/{self.uid}",
             "owner": {
                 "id": self.owner.uid,
                 "display_name": self.owner.display_name,
                 "color": self.owner.color
             },
-            "actions": actions
+            "actions": get_actions(self.owner is user)
         }
 
     @staticmethod
@@ -214,26 +691,46 @@ class Post(db.Model):
 
         return db.session.query(Post).filter_by(uid=uid).first()
 
+    @staticmethod
+    def find_by_uids(uids):
+        """ Get posts by UID with their owners in a single query, mapped by UID """
+
+        posts = db.session.query(Post) \
+            .options(joinedload(Post.owner)) \
+            .filter(Post.uid.in_(uids))
+        return {p.uid: p for p in posts}
+
     def update(self, content):
         """ Update current row """
 
         self.content = content
         self.updated = datetime.now()
+        search_index.index("posts", [self])
+        invalidate_feed()
 
     def delete(self):
-        """ Delete current row """
-        
+        """ Delete current row, its comments are removed with a single statement """
+
+        search_index.unindex("comments", select(Comment.id).where(Comment.post_id == self.id))
+        search_index.unindex("posts", [self.id])
+        Timeline.remove([self.id])
+        db.session.query(Comment).filter_by(post_id=self.id).delete(synchronize_session=False)
         db.session.delete(self)
+        invalidate_feed()
 
-    def get_comments(self, offset=0, limit=20):
+    def get_comments(self, offset=0, limit=20, cursor=None):
         """ Fetch current post comments """
 
-        return self.comments.order_by(desc(Comment.created)).offset(offset).limit(limit)
+        query = self.comments.options(joinedload(Comment.owner))
+        if cursor is not None:
+            return keyset(query, Comment, cursor).limit(limit)
+
+        return query.order_by(desc(Comment.created)).offset(offset).limit(limit)
 
     def get_comments_count(self):
         """ Get current post comment count """
 
-        return self.comments.count()
+        return self.comment_count
 
     def trimmed_content(self, n=150):
         """
@@ -257,12 +754,26 @@ class Comment(db.Model):
     created = Column(DateTime, default=None)
     updated = Column(DateTime, default=None)
 
+    # Back keyset pagination of post comments and of user comments
+    __table_args__ = (
+        Index("ix_comment_post_id_created_id", "post_id", "created", "id"),
+        Index("ix_comment_owner_id_created_id", "owner_id", "created", "id"),
+    )
 
     @staticmethod
     def find_by_uid(uid):
         """ Find a comment by UID """
 
         return db.session.query(Comment).filter_by(uid=uid).first()
+
+    @staticmethod
+    def find_by_uids(uids):
+        """ Get comments by UID with their owners and posts in a single query, mapped by UID """
+
+        comments = db.session.query(Comment) \
+            .options(joinedload(Comment.owner), joinedload(Comment.post)) \
+            .filter(Comment.uid.in_(uids))
+        return {c.uid: c for c in comments}
     
     @staticmethod
     def create(user, post, content):
@@ -278,37 +789,47 @@ class Comment(db.Model):
             updated=now
         )
         db.session.add(new)
+        search_index.index("comments", [new])
+
+        # Increment the post counter in SQL, within the same transaction
+        post.comment_count = Post.comment_count + 1
+        invalidate_feed()
         return new
 
     def public_info(self, user):
         """ Get comment public info """
 
-        if self.owner is user:
-            actions = ["View", "Edit", "Delete"]
-        else:
-            actions = ["View"]
-
         return {
             "id": self.uid,
             "content": self.content,
-            "created": timeago.format(datetime.now() - self.created),
-            "updated": self.updated,
+            "created": render_time(self.created, humanize=True),
+            "updated": render_time(self.updated),
             "owner": {
                 "id": self.owner.uid,
                 "display_name": self.owner.display_name,
                 "color": self.owner.color
             },
             "post_id": self.post.uid,
-            "actions": actions
+            "actions": get_actions(self.owner is user)
         }
 
+    def validator(self):
+        """ Get values that change whenever the comment public info does """
+
+        return (self.uid, self.updated, self.owner.updated)
+
     def update(self, content):
         """ Update an existing comment """
 
         self.content = content
         self.updated = datetime.now()
+        search_index.index("comments", [self])
 
     def delete(self):
         """ Delete current row """
 
-        db.session.delete(self)
\ No newline at end of file
+        # Decrement the post counter in SQL, within the same transaction
+        self.post.comment_count = Post.comment_count - 1
+        search_index.unindex("comments", [self.id])
+        db.session.delete(self)
+        invalidate_feed()
\ No newline at end of file
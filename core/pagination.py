@@ -0,0 +1,104 @@
+"""
+Keyset (cursor) pagination and batch helpers
+    encode_cursor
+    decode_cursor
+    keyset
+    next_cursor
+    cursor_page
+    encode_stream_cursor
+    decode_stream_cursor
+    batch_page
+"""
+
+
+# Imports
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import desc, tuple_
+
+
+# Functions
+def encode_cursor(row):
+    """
+    Generate an opaque cursor pointing right after the given row
+    Cursors are urlsafe base64 of [created, id]
+    """
+
+    raw = json.dumps([row.created.isoformat(), row.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """
+    Parse an opaque cursor into a (created, id) tuple
+    An empty cursor stands for the first page and parses to an empty tuple
+    Raises ValueError in case the cursor is malformed
+    """
+
+    if not cursor:
+        return tuple()
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created, id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created), int(id)
+    except Exception:
+        raise ValueError("invalid cursor")
+
+def keyset(query, model, cursor):
+    """
+    Order a query by descending (created, id) and
+    seek past the cursor instead of scanning skipped rows
+    """
+
+    if cursor:
+        created, id = cursor
+        query = query.filter(tuple_(model.created, model.id) < tuple_(created, id))
+
+    return query.order_by(desc(model.created), desc(model.id))
+
+def next_cursor(rows, limit):
+    """ Get the cursor of the next page, None once the last page has been reached """
+
+    if rows and len(rows) >= limit:
+        return encode_cursor(rows[-1])
+    return None
+
+def cursor_page(result, rows, limit):
+    """ Generate a cursor mode response body """
+
+    return {
+        "data": result,
+        "next_cursor": next_cursor(rows, limit)
+    }
+
+def encode_stream_cursor(kind, row):
+    """ Generate a cursor of a stream mixing kinds of rows, "<kind>.<cursor>" """
+
+    return f"{kind}.{encode_cursor(row)}"
+
+def decode_stream_cursor(cursor, kinds):
+    """
+    Parse a stream cursor into a (kind, (created, id)) tuple
+    An empty cursor stands for the start of the first kind
+    Raises ValueError in case the cursor is malformed
+    """
+
+    if not cursor:
+        return kinds[0], tuple()
+
+    kind, _, position = cursor.partition(".")
+    if kind not in kinds or not position:
+        raise ValueError("invalid cursor")
+    return kind, decode_cursor(position)
+
+def batch_page(ids, found, info):
+    """
+    Generate a batch response body: info of found rows in the requested order,
+    and the requested ids that were not found
+    """
+
+    return {
+        "data": [info(found[i]) for i in ids if i in found],
+        "missing": [i for i in ids if i not in found]
+    }
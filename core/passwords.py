@@ -0,0 +1,88 @@
+"""
+Password hashing
+Hashes use werkzeug's "method$salt$hash" format, the method being set by PASSWORD_HASH_METHOD:
+    pbkdf2:<hash>:<iterations> - PBKDF2 through werkzeug
+    scrypt:<n>:<r>:<p> - scrypt, in the format of werkzeug >= 2.3
+KDF work runs on a bounded thread pool (hashlib releases the GIL),
+so slow hashing can not take over every request worker
+"""
+
+
+# Imports
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from werkzeug.exceptions import ServiceUnavailable
+from werkzeug.security import check_password_hash, gen_salt, generate_password_hash
+from . import app
+import hashlib
+import hmac
+
+
+# Executor
+executor = ThreadPoolExecutor(
+    max_workers=app.config["PASSWORD_HASH_WORKERS"],
+    thread_name_prefix="kdf"
+)
+
+
+# Functions
+def _scrypt(method, salt, pwd):
+    """ Compute an scrypt digest for a "scrypt:n:r:p" method """
+
+    n, r, p = (int(x) for x in method.split(":")[1:])
+    return hashlib.scrypt(
+        pwd.encode(),
+        salt=salt.encode(),
+        n=n, r=r, p=p,
+        maxmem=132 * n * r * p
+    ).hex()
+
+def _hash(pwd, method):
+    """ Hash a password with the given method """
+
+    if method.startswith("scrypt:"):
+        salt = gen_salt(app.config["PASSWORD_SALT_LENGTH"])
+        return f"{method}${salt}${_scrypt(method, salt, pwd)}"
+
+    return generate_password_hash(pwd, method, app.config["PASSWORD_SALT_LENGTH"])
+
+def _verify(pwhash, pwd):
+    """ Verify a password against a hash of any supported method """
+
+    if pwhash.startswith("scrypt:"):
+        method, salt, hashval = pwhash.split("$", 2)
+        return hmac.compare_digest(_scrypt(method, salt, pwd), hashval)
+
+    return check_password_hash(pwhash, pwd)
+
+def _run(f, *args):
+    """ Run KDF work on the pool, 503 in case it is saturated for too long """
+
+    future = executor.submit(f, *args)
+    try:
+        return future.result(timeout=app.config["PASSWORD_HASH_TIMEOUT"])
+    except TimeoutError:
+        future.cancel()
+        raise ServiceUnavailable(description="server is busy, please try again")
+
+def hash_password(pwd):
+    """ Hash a password with the configured method """
+
+    return _run(_hash, pwd, app.config["PASSWORD_HASH_METHOD"])
+
+def hash_passwords(pwds):
+    """ Hash a batch of passwords with the configured method, in parallel """
+
+    method = app.config["PASSWORD_HASH_METHOD"]
+    return list(executor.map(_hash, pwds, [method] * len(pwds)))
+
+def verify_password(pwhash, pwd):
+    """ Verify a password against its hash """
+
+    if not pwhash:
+        return False
+    return _run(_verify, pwhash, pwd)
+
+def needs_rehash(pwhash):
+    """ Check whether a hash was made with other than the configured method """
+
+    return pwhash.split("$", 1)[0] != app.config["PASSWORD_HASH_METHOD"]
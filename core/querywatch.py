@@ -0,0 +1,160 @@
+"""
+N+1 query detector (development and tests)
+Counts structurally identical SQL statements within a request or a watch() block,
+statements repeated more than QUERYWATCH_THRESHOLD times are reported
+with the call site that issued them, as a warning or an exception
+"""
+
+
+# Imports
+import os
+import re
+import sysconfig
+import threading
+import traceback
+import warnings
+from collections import Counter
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# Exceptions
+class RepeatedQueriesWarning(UserWarning):
+    """ Structurally identical statements repeated above the threshold """
+
+class RepeatedQueriesError(Exception):
+    """ Structurally identical statements repeated above the threshold """
+
+
+# Watch
+PACKAGE = os.path.dirname(os.path.abspath(__file__))
+LIBRARIES = tuple({sysconfig.get_paths()[k] for k in ("stdlib", "platstdlib", "purelib", "platlib")})
+SPACES = re.compile(r"\s+")
+IN_LIST = re.compile(r"\(\s*(\?|%s)(\s*,\s*(\?|%s))*\s*\)")
+
+class QueryWatch(object):
+    """ Statements counter of a single request or watch() block """
+
+    def __init__(self, threshold, mode, scope):
+        self.threshold = threshold
+        self.mode = mode
+        self.scope = scope
+        self.counts = Counter()
+        self.sites = dict()
+
+    def record(self, statement):
+        """ Count a statement, remembering where it was first repeated """
+
+        key = IN_LIST.sub("(?)", SPACES.sub(" ", statement).strip())
+        self.counts[key] += 1
+        if self.counts[key] == 2:
+            self.sites[key] = call_site()
+
+    def offenders(self):
+        """ Get (statement, count, call site) of statements repeated above the threshold """
+
+        return [
+            (statement, count, self.sites.get(statement))
+            for statement, count in self.counts.most_common()
+            if count > self.threshold
+        ]
+
+    def report(self):
+        """ Warn or raise in case of repeated statements """
+
+        offenders = self.offenders()
+        if not offenders:
+            return
+
+        lines = [f"repeated queries in {self.scope}:"]
+        for statement, count, site in offenders:
+            lines.append(f"  {count}x at {site or 'unknown'}: {statement}")
+        message = "\n".join(lines)
+
+        if self.mode == "raise":
+            raise RepeatedQueriesError(message)
+        warnings.warn(message, RepeatedQueriesWarning, stacklevel=2)
+
+
+# Functions
+local = threading.local()
+
+def call_site():
+    """
+    Get the innermost frame of the package issuing the current statement,
+    the innermost frame outside of libraries otherwise (e.g. a test)
+    """
+
+    fallback = None
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename == __file__:
+            continue
+        if frame.filename.startswith(PACKAGE):
+            return f"{os.path.relpath(frame.filename, os.path.dirname(PACKAGE))}:{frame.lineno} in {frame.name}"
+        if fallback is None and not frame.filename.startswith(LIBRARIES):
+            fallback = f"{frame.filename}:{frame.lineno} in {frame.name}"
+    return fallback
+
+def active_watches():
+    """ Get the watches of the current thread and request """
+
+    watches = list(getattr(local, "stack", ()))
+    if has_request_context() and "querywatch" in g:
+        watches.append(g.querywatch)
+    return watches
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    for w in active_watches():
+        w.record(statement)
+
+def listen():
+    """ Count statements of every engine """
+
+    if not event.contains(Engine, "before_cursor_execute", before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+
+@contextmanager
+def watch(threshold=5, mode="raise"):
+    """
+    Count statements executed by the current thread within the block,
+    reports repeated statements when the block exits
+    """
+
+    listen()
+    w = QueryWatch(threshold, mode, "watch()")
+    stack = local.__dict__.setdefault("stack", list())
+    stack.append(w)
+    try:
+        yield w
+    finally:
+        stack.remove(w)
+    w.report()
+
+def start_request():
+    """ Watch the current request """
+
+    g.querywatch = QueryWatch(
+        current_app.config["QUERYWATCH_THRESHOLD"],
+        current_app.config["QUERYWATCH_MODE"],
+        f"{request.method} {request.path} ({request.endpoint})"
+    )
+
+def report_request(response):
+    """ Report repeated statements of the current request """
+
+    w = g.pop("querywatch", None)
+    if w is not None:
+        w.report()
+    return response
+
+def init_querywatch(app):
+    """ Watch every request in case QUERYWATCH_MODE is "warn" or "raise" """
+
+    if app.config["QUERYWATCH_MODE"] not in ("warn", "raise"):
+        return
+
+    listen()
+    app.before_request(start_request)
+    app.after_request(report_request)
@@ -0,0 +1,166 @@
+"""
+Full-text search over posts and comments
+SQLite databases use FTS5 tables (post_search, comment_search) whose rowid is the row id,
+kept in sync within the writing transaction by the model hooks.
+Other databases, or SQLite databases without the tables, fall back to LIKE scans
+"""
+
+
+# Imports
+import re
+from sqlalchemy import column, desc, func, select, table, text
+from sqlalchemy.orm import joinedload
+from . import db
+
+
+# FTS5 tables, one per searchable model
+TABLES = {"posts": "post_search", "comments": "comment_search"}
+SOURCES = {"posts": "post", "comments": "comment"}
+TOKENIZER = "unicode61 remove_diacritics 2"
+WORDS = re.compile(r"\w+", re.UNICODE)
+
+
+# Functions
+_enabled = dict()
+
+def enabled():
+    """
+    Check whether the database the session queries (the replica on read-only routes)
+    holds the FTS5 tables, checked once per database
+    """
+
+    engine = db.session().get_bind()
+    key = str(engine.url)
+    if key not in _enabled:
+        if engine.dialect.name != "sqlite":
+            _enabled[key] = False
+        else:
+            with engine.connect() as conn:
+                found = conn.execute(
+                    text("SELECT count(*) FROM sqlite_master WHERE name IN ('post_search', 'comment_search')")
+                ).scalar()
+            _enabled[key] = found == len(TABLES)
+    return _enabled[key]
+
+def match_expression(q):
+    """
+    Turn user input into a safe FTS5 query:
+    every word is quoted, the last one matches as a prefix
+    Returns None in case the input holds no words
+    """
+
+    words = WORDS.findall(q.lower())
+    if not words:
+        return None
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+def index(kind, rows):
+    """ Add or refresh rows of a kind ("posts", "comments") in the index """
+
+    if not rows or not enabled():
+        return
+
+    if any(r.id is None for r in rows):
+        db.session.flush()
+
+    unindex(kind, [r.id for r in rows])
+    db.session.execute(
+        text(f"INSERT INTO {TABLES[kind]} (rowid, content) VALUES (:id, :content)"),
+        [{"id": r.id, "content": r.content} for r in rows]
+    )
+
+def unindex(kind, ids):
+    """ Drop rows of a kind from the index, ids may be a list or a select of ids """
+
+    if not enabled():
+        return
+
+    if isinstance(ids, (list, tuple, set)):
+        if not ids:
+            return
+        db.session.execute(
+            text(f"DELETE FROM {TABLES[kind]} WHERE rowid = :id"),
+            [{"id": id} for id in ids]
+        )
+        return
+
+    fts = table(TABLES[kind], column("rowid"))
+    db.session.execute(fts.delete().where(fts.c.rowid.in_(ids)))
+
+def index_where(kind, condition):
+    """ Index rows of a kind matching a condition with a single INSERT ... SELECT (bulk paths) """
+
+    if not enabled():
+        return
+
+    source = db.Model.metadata.tables[SOURCES[kind]]
+    fts = table(TABLES[kind], column("rowid"), column("content"))
+    db.session.execute(
+        fts.insert().from_select(
+            ["rowid", "content"],
+            select(source.c.id, source.c.content).where(condition)
+        )
+    )
+
+def search(model, kind, q, offset, limit):
+    """
+    Get rows of a model matching a query, best matches first (bm25)
+    Without the index, rows containing every word are returned, newest first
+    """
+
+    words = WORDS.findall(q.lower())
+    query = db.session.query(model).options(joinedload(model.owner))
+    if kind == "comments":
+        query = query.options(joinedload(model.post))
+
+    if not enabled():
+        for w in words:
+            query = query.filter(func.lower(model.content).contains(w, autoescape=True))
+        return query.order_by(desc(model.created), desc(model.id)).offset(offset).limit(limit).all()
+
+    ids = [id for (id,) in db.session.execute(
+        text(
+            f"SELECT rowid FROM {TABLES[kind]} WHERE {TABLES[kind]} MATCH :q "
+            "ORDER BY rank LIMIT :limit OFFSET :offset"
+        ),
+        {"q": match_expression(q), "limit": limit, "offset": offset}
+    )]
+    if not ids:
+        return list()
+
+    found = {r.id: r for r in query.filter(model.id.in_(ids))}
+    return [found[id] for id in ids if id in found]
+
+def rebuild(chunk_size=10000):
+    """
+    Create the FTS5 tables if needed and index every post and comment again,
+    chunk by chunk, committing in between
+    Yields (kind, indexed rows) after every chunk
+    """
+
+    for kind, name in TABLES.items():
+        db.session.execute(text(f"CREATE VIRTUAL TABLE IF NOT EXISTS {name} USING fts5(content, tokenize='{TOKENIZER}')"))
+        db.session.execute(text(f"DELETE FROM {name}"))
+        db.session.commit()
+    _enabled.clear()
+
+    for kind, name in TABLES.items():
+        source = db.Model.metadata.tables[SOURCES[kind]]
+        last, indexed = 0, 0
+        while True:
+            ids = [id for (id,) in db.session.execute(
+                select(source.c.id).where(source.c.id > last).order_by(source.c.id).limit(chunk_size)
+            )]
+            if not ids:
+                break
+
+            index_where(kind, source.c.id.between(ids[0], ids[-1]))
+            db.session.commit()
+            last, indexed = ids[-1], indexed + len(ids)
+            yield kind, indexed
+
+        # Merge index segments for faster queries
+        db.session.execute(text(f"INSERT INTO {name} ({name}) VALUES ('optimize')"))
+        db.session.commit()
@@ -0,0 +1,83 @@
+"""
+JSON serialization backends
+Selected with the JSON_BACKEND config:
+    auto - orjson when installed, the standard library otherwise
+    orjson - orjson, fails at startup in case it is not installed
+    stdlib - the standard library encoder
+"""
+
+
+# Imports
+from datetime import datetime, timezone
+from flask.json import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# HTTP date names, independent of the locale
+DAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+# Functions
+def http_date(value):
+    """
+    Render a datetime as an HTTP date, like werkzeug's http_date
+    Naive datetimes are considered UTC
+    """
+
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+
+    return (
+        f"{DAYS[value.weekday()]}, {value.day:02d} {MONTHS[value.month - 1]} {value.year:04d} "
+        f"{value.hour:02d}:{value.minute:02d}:{value.second:02d} GMT"
+    )
+
+
+# Encoders
+class StdlibEncoder(JSONEncoder):
+    """
+    Flask JSON encoder with a faster path for datetimes,
+    rendered as HTTP dates like Flask's default encoder does
+    """
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return http_date(o)
+        return super().default(o)
+
+
+class OrjsonEncoder(StdlibEncoder):
+    """
+    Flask JSON encoder backed by orjson
+    Honors Flask's sort_keys and indent options, datetimes go through
+    default() so responses hold the same values as with the stdlib encoder
+    """
+
+    def encode(self, o):
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if self.indent:
+            option |= orjson.OPT_INDENT_2
+
+        return orjson.dumps(o, default=self.default, option=option).decode()
+
+
+def get_encoder(backend):
+    """ Get the JSON encoder class of a backend name """
+
+    if backend == "stdlib":
+        return StdlibEncoder
+
+    if backend == "orjson" and orjson is None:
+        raise RuntimeError("JSON_BACKEND is orjson but orjson is not installed")
+
+    if backend in ("auto", "orjson"):
+        return OrjsonEncoder if orjson is not None else StdlibEncoder
+
+    raise ValueError(f"unknown JSON_BACKEND: {backend}")
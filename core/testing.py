@@ -0,0 +1,21 @@
+"""
+Pytest fixtures, enabled with pytest_plugins = ["core.testing"] in conftest.py
+    query_watch
+"""
+
+
+# Imports
+import pytest
+from .querywatch import watch
+
+
+# Fixtures
+@pytest.fixture
+def query_watch():
+    """
+    Fail the test in case a statement is repeated more than 5 times,
+    e.g. a lazy load per serialized row
+    """
+
+    with watch(threshold=5, mode="raise") as w:
+        yield w
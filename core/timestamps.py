@@ -0,0 +1,56 @@
+"""
+Timestamps rendering
+Clients pick a format with the "time" query param or the X-Time-Format header:
+    human - humanized "created" ("5 minutes ago"), raw "updated" (default, legacy)
+    iso - ISO-8601 strings
+    epoch - seconds since the epoch
+"""
+
+
+# Imports
+from datetime import datetime
+from flask import has_request_context, request
+from werkzeug.exceptions import BadRequest
+import timeago
+
+
+# Formats
+FORMATS = ("human", "iso", "epoch")
+HEADER = "X-Time-Format"
+
+
+# Functions
+def time_format():
+    """ Get the timestamps format negotiated by the current request """
+
+    if not has_request_context():
+        return "human"
+
+    fmt = request.args.get("time") or request.headers.get(HEADER) or "human"
+    if fmt not in FORMATS:
+        raise BadRequest(description=f"time format must be one of: {', '.join(FORMATS)}")
+    return fmt
+
+def render_time(value, humanize=False):
+    """
+    Render a timestamp in the negotiated format
+    In legacy mode humanize=True renders "x minutes ago",
+    otherwise the datetime is left to the JSON encoder
+    """
+
+    fmt = time_format()
+    if value is None:
+        return None
+    if fmt == "iso":
+        return value.isoformat()
+    if fmt == "epoch":
+        return int(value.timestamp())
+    if humanize:
+        return timeago.format(datetime.now() - value)
+    return value
+
+def vary_time_format(response):
+    """ Let HTTP caches know responses depend on the X-Time-Format header """
+
+    response.vary.add(HEADER)
+    return response
@@ -4,6 +4,7 @@ Validation schemas
 
 
 # Imports
+from typing import Optional
 from pydantic import BaseModel, Field
 from .settings import Settings as s
 
@@ -42,8 +43,8 @@ class UpdateUser(BaseModel):
         max_length=s.EMAIL_MAXLEN,
         regex=s.EMAIL_REGEX
         )
-    password: str = Field(
-        ..., # is required
+    password: Optional[str] = Field(
+        None, # keeps the current password
         min_length=s.PASS_MINLEN,
         max_length=s.PASS_MAXLEN,
         regex=s.PASS_REGEX
@@ -0,0 +1,31 @@
+"""post comment count
+
+Revision ID: 8a4e6b2c1d93
+Revises: 3f1c2a9d7b10
+Create Date: 2026-10-17 09:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a4e6b2c1d93'
+down_revision = '3f1c2a9d7b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('post', sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill counters of existing posts
+    op.execute(
+        'UPDATE post SET comment_count = '
+        '(SELECT count(comment.id) FROM comment WHERE comment.post_id = post.id)'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('post') as batch_op:
+        batch_op.drop_column('comment_count')
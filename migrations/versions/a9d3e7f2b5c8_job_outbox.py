@@ -0,0 +1,33 @@
+"""job outbox
+
+Revision ID: a9d3e7f2b5c8
+Revises: f4b1c9d2e6a3
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9d3e7f2b5c8'
+down_revision = 'f4b1c9d2e6a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('job_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=True),
+    sa.Column('args', sa.Text(), nullable=True),
+    sa.Column('key', sa.String(length=255), nullable=True),
+    sa.Column('max_attempts', sa.Integer(), nullable=True),
+    sa.Column('run_at', sa.DateTime(), nullable=True),
+    sa.Column('created', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('job_outbox')
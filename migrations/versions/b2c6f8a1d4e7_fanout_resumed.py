@@ -0,0 +1,25 @@
+"""fanout resumed
+
+Revision ID: b2c6f8a1d4e7
+Revises: a9d3e7f2b5c8
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2c6f8a1d4e7'
+down_revision = 'a9d3e7f2b5c8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('user', sa.Column('fanout_resumed', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.drop_column('fanout_resumed')
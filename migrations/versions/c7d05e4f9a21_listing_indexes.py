@@ -0,0 +1,30 @@
+"""listing indexes
+
+Revision ID: c7d05e4f9a21
+Revises: 8a4e6b2c1d93
+Create Date: 2026-10-17 09:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d05e4f9a21'
+down_revision = '8a4e6b2c1d93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_post_created_id', 'post', ['created', 'id'], unique=False)
+    op.create_index('ix_post_owner_id_created_id', 'post', ['owner_id', 'created', 'id'], unique=False)
+    op.create_index('ix_comment_post_id_created_id', 'comment', ['post_id', 'created', 'id'], unique=False)
+    op.create_index('ix_comment_owner_id_created_id', 'comment', ['owner_id', 'created', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_comment_owner_id_created_id', table_name='comment')
+    op.drop_index('ix_comment_post_id_created_id', table_name='comment')
+    op.drop_index('ix_post_owner_id_created_id', table_name='post')
+    op.drop_index('ix_post_created_id', table_name='post')
@@ -0,0 +1,40 @@
+"""search index
+
+Revision ID: e2a8f61b9c07
+Revises: 5b9e3d1a7c42
+Create Date: 2026-10-17 11:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a8f61b9c07'
+down_revision = '5b9e3d1a7c42'
+branch_labels = None
+depends_on = None
+
+
+TOKENIZER = "unicode61 remove_diacritics 2"
+
+
+def upgrade():
+    # FTS5 tables are SQLite only, other databases search with LIKE
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute(f"CREATE VIRTUAL TABLE post_search USING fts5(content, tokenize='{TOKENIZER}')")
+    op.execute(f"CREATE VIRTUAL TABLE comment_search USING fts5(content, tokenize='{TOKENIZER}')")
+
+    # Index existing rows
+    op.execute('INSERT INTO post_search (rowid, content) SELECT id, content FROM post')
+    op.execute('INSERT INTO comment_search (rowid, content) SELECT id, content FROM comment')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute('DROP TABLE comment_search')
+    op.execute('DROP TABLE post_search')
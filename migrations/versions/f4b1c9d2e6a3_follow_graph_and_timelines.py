@@ -0,0 +1,50 @@
+"""follow graph and timelines
+
+Revision ID: f4b1c9d2e6a3
+Revises: e2a8f61b9c07
+Create Date: 2026-10-17 12:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4b1c9d2e6a3'
+down_revision = 'e2a8f61b9c07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('user', sa.Column('follower_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('follow',
+    sa.Column('follower_id', sa.Integer(), nullable=False),
+    sa.Column('followee_id', sa.Integer(), nullable=False),
+    sa.Column('created', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['followee_id'], ['user.id'], ),
+    sa.ForeignKeyConstraint(['follower_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('follower_id', 'followee_id')
+    )
+    op.create_index('ix_follow_followee_id_follower_id', 'follow', ['followee_id', 'follower_id'], unique=False)
+    op.create_table('timeline',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('created', sa.DateTime(), nullable=False),
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['post_id'], ['post.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'created', 'post_id')
+    )
+    op.create_index('ix_timeline_post_id', 'timeline', ['post_id'], unique=False)
+
+    # Every user reads their own posts in the home timeline
+    op.execute('INSERT INTO timeline (user_id, created, post_id) SELECT owner_id, created, id FROM post')
+
+
+def downgrade():
+    op.drop_index('ix_timeline_post_id', table_name='timeline')
+    op.drop_table('timeline')
+    op.drop_index('ix_follow_followee_id_follower_id', table_name='follow')
+    op.drop_table('follow')
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.drop_column('follower_count')
@@ -0,0 +1,78 @@
+"""
+Test fixtures, every test runs against throwaway databases
+    app
+    auth
+    social
+"""
+
+
+# Imports
+import os
+from datetime import datetime, timedelta
+
+# Quotas would throttle the test client
+os.environ["RATELIMIT_ENABLED"] = "false"
+
+import jwt
+import pytest
+from core import app as flask_app, db
+from core.bulk import import_records
+from core.decorators import token_cache
+from core.models import feed_cache, user_cache
+
+
+pytest_plugins = ["core.testing"]
+
+
+# Fixtures
+@pytest.fixture
+def app(tmp_path):
+    """ App bound to empty databases and empty caches """
+
+    for cache in (user_cache, token_cache, feed_cache):
+        cache.clear()
+    flask_app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'database.db'}"
+    flask_app.config["SQLALCHEMY_BINDS"] = {"jobs": f"sqlite:///{tmp_path / 'jobs.db'}"}
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+
+@pytest.fixture
+def auth(app):
+    """ Get request headers holding an access token of a user uid """
+
+    def headers(uid):
+        token = jwt.encode(
+            payload={"uid": uid, "exp": datetime.now() + timedelta(hours=1), "scp": "access"},
+            key=app.secret_key,
+            algorithm="HS256"
+        )
+        return {"Authorization": "Bearer " + token}
+    return headers
+
+@pytest.fixture
+def social(app, auth):
+    """
+    Users with posts and comments on each other's posts, returns the uid and request headers of the first user
+    Pages hold more rows than the query_watch threshold, with distinct owners:
+    the first user has 8 posts and 18 comments on distinct posts, the first post has 8 commenters
+    """
+
+    users = [
+        dict(uid=f"u{i:015d}", email=f"user{i}@test.io", password_hash="-", display_name=f"user {i}")
+        for i in range(10)
+    ]
+    posts = [
+        dict(uid=f"p{i:015d}", owner=users[i % 10]["uid"], content=f"post {i}")
+        for i in range(80)
+    ]
+    comments = [
+        dict(uid=f"c{i:015d}", owner=users[i % 9]["uid"], post=posts[i % 20]["uid"], content=f"comment {i}")
+        for i in range(160)
+    ]
+    for kind, records in (("users", users), ("posts", posts), ("comments", comments)):
+        list(import_records(kind, records, 100))
+
+    uid = users[0]["uid"]
+    return uid, auth(uid)
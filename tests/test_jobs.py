@@ -0,0 +1,82 @@
+"""
+Background jobs queue: outbox, idempotency keys, retries
+"""
+
+
+# Imports
+import pytest
+from core import db, jobs
+
+
+calls = list()
+
+
+def record(value):
+    calls.append(value)
+
+def fail():
+    calls.append("failed")
+    raise RuntimeError("job failed")
+
+
+# Fixtures
+@pytest.fixture(autouse=True)
+def queue(app, monkeypatch):
+    """ Retry failed jobs right away """
+
+    monkeypatch.setitem(app.config, "JOB_RETRY_DELAY", 0)
+    calls.clear()
+
+
+# Tests
+def test_enqueue_commit(app):
+    jobs.enqueue(record, 1)
+    db.session.commit()
+    assert jobs.JobOutbox.query.count() == 0
+    assert jobs.stats() == {"queued": 1}
+
+    jobs.work(2, 0.01, once=True)
+    assert calls == [1]
+    assert jobs.stats() == {"done": 1}
+
+def test_enqueue_rollback(app):
+    jobs.enqueue(record, 1)
+    db.session.rollback()
+    db.session.commit()
+    assert jobs.JobOutbox.query.count() == 0
+    assert jobs.stats() == {}
+
+def test_idempotency_key(app):
+    jobs.enqueue(record, 1, key="once")
+    db.session.commit()
+    jobs.enqueue(record, 2, key="once")
+    db.session.commit()
+
+    jobs.work(2, 0.01, once=True)
+    assert calls == [1]
+
+def test_retries(app, monkeypatch):
+    monkeypatch.setitem(app.config, "JOB_MAX_ATTEMPTS", 3)
+    jobs.enqueue(fail)
+    db.session.commit()
+
+    jobs.work(2, 0.01, once=True)
+    assert calls == ["failed"] * 3
+    assert jobs.stats() == {"failed": 1}
+    with jobs.engine().connect() as conn:
+        job = conn.execute(jobs.Job.__table__.select()).one()
+    assert job.attempts == 3
+    assert "job failed" in job.last_error
+
+def test_worker_drains_outbox(app):
+    # Jobs left in the outbox, e.g. the queue was unavailable when the request committed
+    jobs.enqueue(record, 1)
+    jobs.enqueue(record, 2)
+    db.session.info.pop("jobs_enqueued")
+    db.session.commit()
+    assert jobs.JobOutbox.query.count() == 2
+
+    jobs.work(2, 0.01, once=True)
+    assert jobs.JobOutbox.query.count() == 0
+    assert sorted(calls) == [1, 2]
+    assert jobs.stats() == {"done": 2}
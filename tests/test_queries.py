@@ -0,0 +1,34 @@
+"""
+Serializing lists of posts and comments must not issue a query per row
+"""
+
+
+def test_feed(app, social, query_watch):
+    uid, headers = social
+    response = app.test_client().get("/posts?limit=20", headers=headers)
+    assert response.status_code == 200
+    assert len(response.get_json()) == 20
+
+def test_user_posts(app, social, query_watch):
+    uid, headers = social
+    response = app.test_client().get(f"/users/{uid}/posts?limit=30", headers=headers)
+    assert response.status_code == 200
+    assert len(response.get_json()) == 8
+
+def test_user_comments(app, social, query_watch):
+    uid, headers = social
+    response = app.test_client().get(f"/users/{uid}/comments?limit=30", headers=headers)
+    assert response.status_code == 200
+    assert len(response.get_json()) == 18
+
+def test_user_comments_cursor(app, social, query_watch):
+    uid, headers = social
+    response = app.test_client().get(f"/users/{uid}/comments?limit=20&cursor=", headers=headers)
+    assert response.status_code == 200
+    assert len(response.get_json()["data"]) == 18
+
+def test_post_comments(app, social, query_watch):
+    uid, headers = social
+    response = app.test_client().get("/posts/p000000000000000/comments?limit=30", headers=headers)
+    assert response.status_code == 200
+    assert len(response.get_json()) == 8
@@ -0,0 +1,114 @@
+"""
+Follow graph and home timelines: backfill, fan-out limit, unfollow and purge
+"""
+
+
+# Imports
+import pytest
+from core import db
+from core.bulk import import_records
+from core.models import Follow, Post, Timeline, User
+
+
+# Fixtures
+@pytest.fixture
+def people(app, auth):
+    """ Users a to f, mapped to (uid, request headers) """
+
+    names = "abcdef"
+    list(import_records("users", [
+        dict(uid=f"{n}{'0' * 15}", email=f"{n}@test.io", password_hash="-", display_name=n * 3)
+        for n in names
+    ], 100))
+    return {n: (f"{n}{'0' * 15}", auth(f"{n}{'0' * 15}")) for n in names}
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+# Helpers
+def post(client, people, name, content):
+    response = client.post("/posts", json={"content": content}, headers=people[name][1])
+    assert response.status_code == 201
+    return response.get_json()["id"]
+
+def follow(client, people, follower, followee):
+    return client.post(f"/users/{people[followee][0]}/follow", headers=people[follower][1]).status_code
+
+def unfollow(client, people, follower, followee):
+    return client.delete(f"/users/{people[followee][0]}/follow", headers=people[follower][1]).status_code
+
+def home(client, people, name):
+    response = client.get("/posts/home", headers=people[name][1])
+    assert response.status_code == 200
+    return [p["content"] for p in response.get_json()]
+
+
+# Tests
+def test_follow_backfill(client, people):
+    for i in range(3):
+        post(client, people, "a", f"a{i}")
+    post(client, people, "b", "b0")
+
+    assert follow(client, people, "b", "a") == 201
+    assert follow(client, people, "b", "a") == 200
+    assert home(client, people, "b") == ["b0", "a2", "a1", "a0"]
+
+    post(client, people, "a", "a3")
+    assert home(client, people, "b") == ["a3", "b0", "a2", "a1", "a0"]
+    assert home(client, people, "c") == []
+
+def test_fanout_limit_crossing(app, client, people, monkeypatch):
+    monkeypatch.setitem(app.config, "TIMELINE_FANOUT_LIMIT", 2)
+
+    post(client, people, "a", "a0")
+    for name in "bcd":
+        follow(client, people, name, "a")
+
+    # Above the limit: merged at read time
+    post(client, people, "a", "a1 celebrity")
+    assert home(client, people, "b") == ["a1 celebrity", "a0"]
+
+    # Back at the limit: fanned out again, earlier posts still merged
+    assert unfollow(client, people, "d", "a") == 200
+    post(client, people, "a", "a2")
+    assert home(client, people, "b") == ["a2", "a1 celebrity", "a0"]
+
+    # Above the limit again
+    follow(client, people, "e", "a")
+    post(client, people, "a", "a3 celebrity")
+    assert home(client, people, "b") == ["a3 celebrity", "a2", "a1 celebrity", "a0"]
+    assert home(client, people, "e") == ["a3 celebrity", "a2", "a1 celebrity", "a0"]
+
+    # Back at the limit through a follower's purge
+    assert client.delete("/users/me", headers=people["e"][1]).status_code == 200
+    post(client, people, "a", "a4")
+    assert home(client, people, "b") == ["a4", "a3 celebrity", "a2", "a1 celebrity", "a0"]
+    assert home(client, people, "c") == ["a4", "a3 celebrity", "a2", "a1 celebrity", "a0"]
+
+def test_unfollow(client, people):
+    follow(client, people, "b", "a")
+    post(client, people, "a", "a0")
+    post(client, people, "b", "b0")
+
+    assert unfollow(client, people, "b", "a") == 200
+    assert unfollow(client, people, "b", "a") == 404
+    assert home(client, people, "b") == ["b0"]
+
+    b = User.find_by_uid(people["b"][0])
+    assert db.session.query(Timeline).filter_by(user_id=b.id).count() == 1
+
+def test_purge_followed_user(client, people):
+    follow(client, people, "b", "a")
+    follow(client, people, "a", "b")
+    post(client, people, "a", "a0")
+    post(client, people, "b", "b0")
+
+    assert client.delete("/users/me", headers=people["a"][1]).status_code == 200
+    assert home(client, people, "b") == ["b0"]
+
+    assert db.session.query(Post).count() == 1
+    assert db.session.query(Follow).count() == 0
+    assert db.session.query(Timeline).count() == 1
+    assert User.find_by_uid(people["b"][0]).follower_count == 0